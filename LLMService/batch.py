@@ -0,0 +1,117 @@
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils import log_message
+
+def read_requests(path):
+    """Yields `(id, task, request)` from a JSONL file of either envelopes
+    (`{"id", "task", "request"}`) or bare LLM requests; missing ids default
+    to the line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if "request" in obj:
+                yield obj.get("id", line_no), obj.get("task", "llm"), obj["request"]
+            else:
+                yield obj.get("id", line_no), "llm", obj
+
+def finished_ids(path):
+    done = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return done
+
+class Progress:
+    def __init__(self, total, interval=2.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.start = time.monotonic()
+        self.last = 0.0
+
+    def update(self, success):
+        self.done += 1
+        self.failed += 0 if success else 1
+        if time.monotonic() - self.last >= self.interval or self.done == self.total:
+            self.report()
+
+    def report(self):
+        self.last = time.monotonic()
+        elapsed = self.last - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        sys.stderr.write(
+            f"\r[batch] {self.done}/{self.total} done, {self.failed} failed, "
+            f"{rate:.2f} req/s, ETA {eta:.0f}s"
+        )
+        sys.stderr.flush()
+
+def run_batch(handle_task, input_path, output_path, workers):
+    """Runs every request of `input_path` through `handle_task(task, request)`
+    on `workers` threads and appends `{"id", ...response}` lines to
+    `output_path` as they complete. Ids already in the output are skipped, so
+    an interrupted batch resumes where it stopped."""
+    done = finished_ids(output_path)
+    pending_requests = [r for r in read_requests(input_path) if r[0] not in done]
+    progress = Progress(len(pending_requests))
+    if done:
+        sys.stderr.write(f"[batch] Resuming: {len(done)} already done, {len(pending_requests)} left\n")
+    log_message(f"📦 Batch of {len(pending_requests)} requests with {workers} workers")
+
+    def run_one(item):
+        req_id, task, req = item
+        try:
+            response = handle_task(task, req)
+        except Exception as e:
+            response = {"success": False, "message": f"Service error: {e}"}
+        return dict(response, id=req_id)
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        items = iter(pending_requests)
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < workers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    in_flight.add(pool.submit(run_one, item))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    response = future.result()
+                    out.write(json.dumps(response, ensure_ascii=False) + "\n")
+                    out.flush()
+                    progress.update(response.get("success", False))
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            sys.stderr.write("\n[batch] Interrupted; rerun the same command to resume.\n")
+            raise
+
+    if pending_requests:
+        sys.stderr.write("\n")
+    elapsed = time.monotonic() - progress.start
+    summary = {
+        "success": True,
+        "total": len(pending_requests),
+        "failed": progress.failed,
+        "skipped": len(done),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(pending_requests) / elapsed, 3) if elapsed else 0.0,
+        "message": "OK"
+    }
+    log_message(f"📦 Batch finished: {summary}")
+    return summary
@@ -0,0 +1,179 @@
+"""Benchmark for `extract_context_from_source` on a large generated Lean file.
+
+Compares the original per-call regex scan with the cached, incremental
+`SourceIndex`, and checks that both return identical results.
+
+    python bench/context.py --decls 1500 --lookups 200
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import source_index
+from source_index import get_source_index
+
+def legacy_extract_context(source, pos):
+    if not source or pos is None:
+        return None, None
+
+    try:
+        source_bytes = source.encode('utf-8')
+        if pos > len(source_bytes):
+            pos = len(source_bytes)
+        prefix_bytes = source_bytes[:pos]
+        prefix = prefix_bytes.decode('utf-8', errors='ignore')
+    except Exception as e:
+        prefix = source[:pos]
+
+    lines = prefix.split('\n')
+    
+    implicit_hint = None
+    hint_lines = []
+    
+    if lines:
+        lines.pop()
+
+    while lines:
+        line = lines[-1].strip()
+        if line.startswith("--"):
+            content = line.lstrip("-").strip()
+            hint_lines.append(content)
+            lines.pop()
+        elif not line:
+            lines.pop()
+        else:
+            break
+
+    if hint_lines:
+        implicit_hint = "\n".join(reversed(hint_lines))
+
+    keywords = ["theorem", "lemma", "def", "instance", "example", "structure", "class"]
+    decl_start_index = -1
+    found_keyword = ""
+
+    for keyword in keywords:
+        pattern = re.compile(r'\b' + keyword + r'\b')
+        for match in pattern.finditer(prefix):
+            match_idx = match.start()
+            
+            line_start = prefix.rfind('\n', 0, match_idx) + 1
+            line_before_kw = prefix[line_start:match_idx]
+            if "--" in line_before_kw:
+                continue
+            if match_idx > decl_start_index:
+                decl_start_index = match_idx
+                found_keyword = keyword
+    
+    theorem_decl = "Theorem context not found."
+
+    if decl_start_index != -1:
+        raw_decl = prefix[decl_start_index:]
+        cut_idx = len(raw_decl)
+        balance = 0
+        in_string = False
+        in_char = False
+        found_end = False
+        
+        for i, char in enumerate(raw_decl):
+            if in_string:
+                if char == '"' and raw_decl[i-1] != '\\': in_string = False
+                continue
+            if in_char:
+                if char == "'" and raw_decl[i-1] != '\\': in_char = False
+                continue
+                
+            if char == '"': 
+                in_string = True
+                continue
+            if char == "'": 
+                in_char = True
+                continue
+
+            if char in '({[':
+                balance += 1
+            elif char in ')}]':
+                balance -= 1
+            if balance == 0:
+                if raw_decl[i:].startswith(":="):
+                    cut_idx = i
+                    found_end = True
+                    break
+                if (raw_decl[i:].startswith(" by ") or 
+                    raw_decl[i:].startswith("\nby ") or
+                    (raw_decl[i:].startswith("by ") and (i==0 or raw_decl[i-1].isspace()))):
+                    cut_idx = i
+                    found_end = True
+                    break
+                if (raw_decl[i:].startswith(" where ") or 
+                    raw_decl[i:].startswith("\nwhere ")):
+                    cut_idx = i
+                    found_end = True
+                    break
+
+        theorem_decl = raw_decl[:cut_idx].strip()
+        if len(theorem_decl) < len(found_keyword) + 2:
+            theorem_decl = raw_decl
+
+    return theorem_decl, implicit_hint
+
+def generate_source(decls, rng):
+    parts = ["import Mathlib\n\nopen Nat\n\n"]
+    for i in range(decls):
+        kind = rng.choice(["theorem", "lemma", "def", "instance", "example"])
+        parts.append(f"-- helper {i}: the lemma below is about (a : ℕ)\n")
+        parts.append(f"{kind} t{i} (a b : ℕ) (h : a ≤ b) : a + {i} ≤ b + {i} := by\n")
+        parts.append(f"  -- try omega on step {i}\n  omega\n\n")
+    return "".join(parts)
+
+def positions(source, count, rng):
+    encoded = source.encode("utf-8")
+    return [rng.randrange(len(encoded)) for _ in range(count)]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--decls", type=int, default=1500)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    source = generate_source(args.decls, rng)
+    lines = source.count("\n")
+    pos_list = positions(source, args.lookups, rng)
+    print(f"source: {lines} lines, {len(source)} chars, {args.lookups} lookups")
+
+    legacy_ms, legacy = timed(lambda: [legacy_extract_context(source, p) for p in pos_list])
+    source_index._index_cache.clear()
+    cold_ms, _ = timed(get_source_index, source)
+    indexed_ms, indexed = timed(lambda: [get_source_index(source).context_at(p) for p in pos_list])
+    assert legacy == indexed, "indexed results differ from the legacy scan"
+    print(f"legacy scan:     {legacy_ms / args.lookups:8.3f} ms/lookup")
+    print(f"index build:     {cold_ms:8.3f} ms (once per content)")
+    print(f"indexed lookup:  {indexed_ms / args.lookups:8.3f} ms/lookup")
+
+    rebuild_total, update_total = 0.0, 0.0
+    for _ in range(args.edits):
+        cut = rng.randrange(len(source))
+        source = source[:cut] + rng.choice(["x", "\n", "-- c\n", "theorem e : True := trivial\n", ""]) + source[cut + rng.randrange(3):]
+        rebuild_ms, rebuilt = timed(source_index.SourceIndex.build, source)
+        update_ms, updated = timed(get_source_index, source)
+        rebuild_total += rebuild_ms
+        update_total += update_ms
+        assert (rebuilt.starts, rebuilt.keywords, rebuilt.line_starts) == (updated.starts, updated.keywords, updated.line_starts), "incremental update diverged"
+        for p in positions(source, 5, rng):
+            assert legacy_extract_context(source, p) == updated.context_at(p), "edited results differ"
+    print(f"full rebuild:    {rebuild_total / args.edits:8.3f} ms/edit")
+    print(f"incremental:     {update_total / args.edits:8.3f} ms/edit")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Load generator for `service.py` against an OpenAI-compatible endpoint.
+
+Starts `service.py --serve` on a Unix socket (or one-shot processes with
+`--mode oneshot`), pointed at `--base-url` (typically `bench/stub_server.py`),
+and sends a weighted mix of request types from `--concurrency` clients.
+Every request uses a distinct goal so the cache and single-flight layers do
+not short-circuit it. Reports throughput, p50/p95/p99 latency per request
+type and error kinds, plus the stub's connection counters when available.
+
+    python bench/stub_server.py --latency lognormal:800:0.5 &
+    python bench/loadgen.py --requests 500 --concurrency 16 \\
+        --mix init_next=4,diagnose=2,fix_next=2,init_auto=1
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from collections import Counter
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service.py")
+
+SOURCE = "import Mathlib\n\ntheorem t (a b c : ℕ) (h : a ≤ b) : a + c ≤ b + c := by\n  sorry\n"
+POS = SOURCE.index("sorry")
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def make_request(req_type, i):
+    goal = f"a b c : ℕ\nh : a ≤ b\nh{i} : c ≤ {i}\n⊢ a + c + {i} ≤ b + c + {i}"
+    req = {"requestType": req_type, "goalState": goal, "source": SOURCE, "pos": POS, "hint": None,
+           "prevTactic": None, "errorMsg": None, "searchResults": None, "diagnosisInfo": None}
+    if req_type == "diagnose" or req_type.startswith(("fix_", "repair_")):
+        req.update(prevTactic="simp", errorMsg=f"simp made no progress ({i})")
+    if req_type.startswith("fix_"):
+        req.update(diagnosisInfo="Needs monotonicity of addition.",
+                   searchResults="Nat.add_le_add_right : n ≤ m → n + k ≤ m + k")
+    return req
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+class DaemonClient:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, req):
+        self.sock.sendall((json.dumps({"task": "llm", "request": req}) + "\n").encode("utf-8"))
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+def send_oneshot(req, env, cwd):
+    proc = subprocess.run([sys.executable, SERVICE], input=json.dumps(req), capture_output=True, text=True, env=env, cwd=cwd)
+    return json.loads(proc.stdout)
+
+def start_daemon(env, path, cwd):
+    proc = subprocess.Popen([sys.executable, SERVICE, "--serve", "--socket", path], env=env, cwd=cwd)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("service.py --serve did not start")
+        time.sleep(0.05)
+    return proc
+
+def stub_stats(base_url):
+    url = base_url.rstrip("/")
+    url = url[:-3] if url.endswith("/v1") else url
+    try:
+        with urllib.request.urlopen(url + "/stats", timeout=2) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/v1")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="init_next=4,diagnose=2,fix_next=2,init_auto=1")
+    parser.add_argument("--mode", choices=["daemon", "oneshot"], default="daemon")
+    parser.add_argument("--stream", action="store_true", help="Set LLM_STREAM=true for the service")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="llm-loadgen-")
+    env = dict(
+        os.environ,
+        LLM_PROVIDER="openai",
+        LLM_BASE_URL=args.base_url,
+        LLM_API_KEY=os.environ.get("LLM_API_KEY", "stub"),
+        LLM_CACHE_DB=os.path.join(workdir, "cache.db"),
+        LLM_SINGLEFLIGHT_DIR=os.path.join(workdir, "singleflight"),
+        LLM_STREAM="true" if args.stream else os.environ.get("LLM_STREAM", "false"),
+    )
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    types = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+    jobs = iter(enumerate(types))
+    jobs_lock = threading.Lock()
+    results = []
+    results_lock = threading.Lock()
+
+    socket_path = os.path.join(workdir, "llm.sock")
+    daemon = start_daemon(env, socket_path, workdir) if args.mode == "daemon" else None
+    before = stub_stats(args.base_url)
+
+    def client():
+        conn = DaemonClient(socket_path) if daemon else None
+        try:
+            while True:
+                with jobs_lock:
+                    job = next(jobs, None)
+                if job is None:
+                    return
+                i, req_type = job
+                req = make_request(req_type, i)
+                start = time.perf_counter()
+                try:
+                    response = conn.send(req) if conn else send_oneshot(req, env, workdir)
+                    outcome = "ok" if response.get("success") else response.get("errorType") or "failed"
+                except (OSError, ValueError) as e:
+                    outcome = f"client:{type(e).__name__}"
+                with results_lock:
+                    results.append((req_type, time.perf_counter() - start, outcome))
+        finally:
+            if conn:
+                conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    after = stub_stats(args.base_url)
+    if daemon:
+        daemon.terminate()
+        daemon.wait()
+
+    summary = {"requests": len(results), "concurrency": args.concurrency, "seconds": wall,
+               "throughput": len(results) / wall if wall else 0.0, "types": {},
+               "outcomes": dict(Counter(outcome for _, _, outcome in results))}
+    print(f"{len(results)} requests, concurrency {args.concurrency}, {args.mode} mode, {wall:.1f}s")
+    print(f"{'type':<14}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for req_type in sorted(mix) + ["all"]:
+        rows = [r for r in results if req_type in ("all", r[0])]
+        if not rows:
+            continue
+        latencies = [seconds * 1000 for _, seconds, _ in rows]
+        errors = sum(1 for *_, outcome in rows if outcome != "ok")
+        row = {"count": len(rows), "errors": errors, "p50": percentile(latencies, 0.50),
+               "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99)}
+        summary["types"][req_type] = row
+        print(f"{req_type:<14}{row['count']:>7}{errors:>8}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+    print(f"throughput: {summary['throughput']:.2f} req/s")
+    print(f"outcomes: {summary['outcomes']}")
+    if before and after:
+        summary["stub"] = {
+            "requests": after.get("requests", 0) - before.get("requests", 0),
+            "connections": after.get("connections", 0) - before.get("connections", 0),
+            "status_429": after.get("status_429", 0) - before.get("status_429", 0),
+            "peak_in_flight": after.get("peak_in_flight", 0),
+        }
+        print(f"stub: {summary['stub']}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Record/replay benchmark for the `LLMCore.process_full_request` pipeline.
+
+Replays a JSONL corpus of `{"request", "responses"}` entries (written by the
+service when `LLM_RECORD_FILE` is set, or generated with `--synthesize`)
+through `LLMCore` with `ReplayLLMProvider`, and reports per-stage latency
+percentiles and throughput. Each pass starts from an empty cache so results
+are comparable across commits; `--save` / `--compare` keep a baseline.
+
+    python bench/replay.py --synthesize 300 corpus.jsonl
+    python bench/replay.py corpus.jsonl --passes 5 --save baseline.json
+    python bench/replay.py corpus.jsonl --passes 5 --compare baseline.json
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = ("total", "cache", "context", "extract", "search", "render", "provider", "parse")
+
+TACTIC_RESPONSE = "<think>\nomega should close it.\n</think>\n```lean\nomega\n```"
+DIAGNOSE_RESPONSE = "ANALYSIS: The goal needs commutativity of addition.\nSEARCH: add comm nat\n"
+PLAN_RESPONSE = '```json\n{"type": "CHAIN", "plan": ["intro n", "omega"]}\n```'
+
+def synthesize(count, path, seed=0):
+    """Writes a corpus that mixes every request kind over one large Lean source."""
+    rng = random.Random(seed)
+    decls = []
+    for i in range(400):
+        decls.append(f"-- lemma {i} about addition\ntheorem t{i} (a b : ℕ) (h : a ≤ b) : a + {i} ≤ b + {i} := by\n  sorry\n\n")
+    source = "import Mathlib\n\n" + "".join(decls)
+    positions = [source.encode("utf-8").index(f"t{i} (a".encode("utf-8")) + 60 for i in range(400)]
+
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            k = rng.randrange(400)
+            goal = "\n".join(f"x{j} : ℕ" for j in range(rng.randrange(1, 30))) + f"\nh : a ≤ b\n⊢ a + {k} ≤ b + {k}"
+            base = {"goalState": goal, "source": source, "pos": positions[k], "hint": None,
+                    "prevTactic": None, "errorMsg": None, "searchResults": None, "diagnosisInfo": None}
+            kind = rng.choice(["init_next", "init_next", "diagnose", "fix_next", "report_success", "init_auto"])
+            if kind == "diagnose":
+                req = dict(base, requestType="diagnose", prevTactic="simp", errorMsg="simp made no progress")
+                responses = [DIAGNOSE_RESPONSE]
+            elif kind == "fix_next":
+                results = "\n".join(f"Nat.add_le_add_right{j} : a ≤ b → a + c ≤ b + c" for j in range(30))
+                req = dict(base, requestType="fix_next", prevTactic="simp", errorMsg="simp made no progress",
+                           searchResults=results, diagnosisInfo="needs monotonicity")
+                responses = [TACTIC_RESPONSE]
+            elif kind == "report_success":
+                req = dict(base, requestType="report_success", prevTactic="omega", diagnosisInfo="next")
+                responses = []
+            elif kind == "init_auto":
+                req = dict(base, requestType="init_auto")
+                responses = [PLAN_RESPONSE]
+            else:
+                req = dict(base, requestType="init_next")
+                responses = [TACTIC_RESPONSE]
+            f.write(json.dumps({"request": req, "responses": responses}, ensure_ascii=False) + "\n")
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def run_pass(corpus, workdir, latency, timings):
+    os.environ["LLM_CACHE_DB"] = os.path.join(workdir, f"cache-{time.time_ns()}.db")
+    from core import LLMCore
+    from providers import ReplayLLMProvider
+
+    core = LLMCore()
+    core._provider = ReplayLLMProvider(latency)
+    core.record = lambda req, responses: None
+    core.stage_listeners.append(lambda name, seconds: timings[name].append(seconds * 1000))
+
+    start = time.perf_counter()
+    for entry in corpus:
+        core.provider.load(entry["responses"])
+        t0 = time.perf_counter()
+        core.process_full_request(entry["request"])
+        timings["total"].append((time.perf_counter() - t0) * 1000)
+    return time.perf_counter() - start
+
+def summarize(timings, requests, wall):
+    summary = {"throughput": requests / wall if wall else 0.0, "stages": {}}
+    for name in STAGES:
+        values = timings[name]
+        if values:
+            summary["stages"][name] = {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+            }
+    return summary
+
+def print_summary(summary, baseline=None):
+    print(f"{'stage':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in summary["stages"].items():
+        line = f"{name:<10}{row['count']:>8}{row['p50']:>10.3f}{row['p95']:>10.3f}{row['p99']:>10.3f}"
+        base = baseline and baseline["stages"].get(name)
+        if base and base["p50"]:
+            line += f"   p50 {100 * (row['p50'] - base['p50']) / base['p50']:+.1f}%"
+        print(line)
+    line = f"throughput: {summary['throughput']:.1f} req/s"
+    if baseline and baseline.get("throughput"):
+        line += f" ({100 * (summary['throughput'] - baseline['throughput']) / baseline['throughput']:+.1f}%)"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", help="JSONL corpus to replay (or to write with --synthesize)")
+    parser.add_argument("--synthesize", type=int, metavar="N", help="Write a synthetic corpus of N requests and exit")
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Passes run before measuring")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated provider latency")
+    parser.add_argument("--save", help="Write the summary as JSON")
+    parser.add_argument("--compare", help="Print changes relative to a saved summary")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize(args.synthesize, args.corpus)
+        print(f"Wrote {args.synthesize} requests to {args.corpus}")
+        return
+
+    corpus = load_corpus(args.corpus)
+    workdir = tempfile.mkdtemp(prefix="llm-replay-")
+    os.chdir(workdir)
+    for _ in range(args.warmup):
+        run_pass(corpus, workdir, args.latency_ms / 1000, {name: [] for name in STAGES})
+
+    timings = {name: [] for name in STAGES}
+    wall = sum(run_pass(corpus, workdir, args.latency_ms / 1000, timings) for _ in range(args.passes))
+    summary = summarize(timings, len(corpus) * args.passes, wall)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"{len(corpus)} requests x {args.passes} passes")
+    print_summary(summary, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
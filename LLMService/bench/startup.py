@@ -0,0 +1,93 @@
+"""Startup-time benchmark for one-shot `service.py` invocations.
+
+Runs each request type through a fresh interpreter, prints the top-level
+`-X importtime` breakdown and end-to-end wall time, and exits non-zero when
+a scenario's median exceeds `--budget-ms` over the bare interpreter floor.
+
+    python bench/startup.py --runs 20 --budget-ms 60
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service.py")
+
+GOAL = "a b : ℕ\n⊢ a + b = b + a"
+
+SCENARIOS = {
+    "report_success": ([], {"requestType": "report_success", "goalState": GOAL, "prevTactic": "omega", "diagnosisInfo": "next"}),
+    "cache_hit": ([], {"requestType": "init_next", "goalState": GOAL}),
+    "mock_miss": ([], {"requestType": "init_next", "goalState": "n : ℕ\n⊢ n * 0 = 0"}),
+}
+
+def run_once(args, payload, env, cwd, extra_flags=()):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, *extra_flags, SERVICE, *args],
+        input=json.dumps(payload), capture_output=True, text=True, env=env, cwd=cwd
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, proc
+
+def import_breakdown(stderr, top):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if name.startswith("  "):
+            continue
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--top", type=int, default=8, help="Number of top-level imports to show")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a median exceeds the interpreter floor by more than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="llm-startup-")
+    env = dict(os.environ, LLM_PROVIDER="mock", LLM_CACHE_DB=os.path.join(workdir, "cache.db"), LLM_DAEMON_SOCKET="")
+
+    samples = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        samples.append((time.perf_counter() - start) * 1000)
+    floor = statistics.median(samples)
+    print(f"interpreter floor: {floor:.1f} ms\n")
+
+    over_budget = []
+    for name, (cli_args, payload) in SCENARIOS.items():
+        _, proc = run_once(cli_args, payload, env, workdir, ("-X", "importtime"))
+        if proc.returncode != 0:
+            print(f"{name}: failed\n{proc.stderr}")
+            over_budget.append(name)
+            continue
+        timings = [run_once(cli_args, payload, env, workdir)[0] for _ in range(args.runs)]
+        median = statistics.median(timings)
+        print(f"{name}: median {median:.1f} ms  p95 {percentile(timings, 0.95):.1f} ms  "
+              f"min {min(timings):.1f} ms  (+{median - floor:.1f} ms over floor)")
+        for cumulative_us, module in import_breakdown(proc.stderr, args.top):
+            print(f"    {cumulative_us / 1000:8.1f} ms  {module}")
+        print()
+        if args.budget_ms is not None and median - floor > args.budget_ms:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Local OpenAI-compatible chat-completions server for offline load tests.
+
+Serves `POST /v1/chat/completions` (plain and `stream: true` SSE) with
+configurable time to first token, token rate and injected faults, so that
+timeouts, 429 handling, slow streams, concurrency limits and connection reuse
+of `CustomOpenAIProvider` can be exercised without a live provider.
+`GET /stats` returns request, status and connection counters.
+
+    python bench/stub_server.py --port 8000 --latency lognormal:800:0.5 --tokens-per-sec 60 \\
+        --rate-limit-rate 0.05 --error-rate 0.01 --max-concurrency 16
+    LLM_BASE_URL=http://127.0.0.1:8000/v1 LLM_API_KEY=stub python service.py --serve
+
+Latency specs: `fixed:MS`, `uniform:LO:HI`, `exp:MEAN`, `lognormal:MEDIAN:SIGMA`
+(all in milliseconds). `--corpus` takes either a JSON object of response
+lists (`{"tactic": [...], "diagnose": [...], "plan": [...], "decision": [...]}`)
+or a JSONL corpus recorded with `LLM_RECORD_FILE`.
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CORPUS = {
+    "tactic": [
+        "<think>\nThe goal is linear arithmetic.\n</think>\n```lean\nomega\n```",
+        "<think>\nSimplification should close it.\n</think>\n```lean\nsimp\n```",
+        "<think>\nSplit into the two directions.\n</think>\n```lean\nconstructor\n· intro h\n  exact h\n· intro h\n  exact h\n```",
+    ],
+    "diagnose": [
+        "ANALYSIS: The tactic needs a monotonicity lemma for addition.\nSEARCH: add le add right\n",
+        "ANALYSIS: The identifier does not exist in Mathlib.\nSEARCH: mul comm\n",
+    ],
+    "plan": [
+        '<think>\nTwo intermediate facts are needed.\n</think>\n```json\n{"type": "CHAIN", "plan": ["show a ≤ b", "conclude by transitivity"]}\n```',
+        '<think>\nInduction on n.\n</think>\n```json\n{"type": "COMPOUND", "plan": ["induction n", "base case by simp", "step by omega"]}\n```',
+    ],
+    "decision": [
+        '```json\n{"action": "next", "hint": "Introduce the hypotheses first."}\n```',
+        '```json\n{"action": "done", "hint": "omega closes it."}\n```',
+    ],
+}
+
+# Distinctive phrases of the system prompts in `prompts/`.
+KIND_MARKERS = (("DIAGNOSTICIAN", "diagnose"), ("Proof Architect", "plan"), ("Decision Maker", "decision"))
+
+def parse_latency(spec):
+    """Returns a function drawing one latency, in seconds, from `spec`."""
+    kind, _, rest = spec.partition(":")
+    params = rest.split(":")
+    seconds = [float(x) / 1000 for x in params[:2] if x]
+    if kind == "fixed":
+        return lambda: seconds[0]
+    if kind == "uniform":
+        return lambda: random.uniform(seconds[0], seconds[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / seconds[0]) if seconds[0] > 0 else 0.0
+    if kind == "lognormal":
+        median, sigma = seconds[0], float(params[1])
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+def load_corpus(path):
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, "r", encoding="utf-8") as f:
+        if not path.endswith(".jsonl"):
+            return dict(DEFAULT_CORPUS, **json.load(f))
+        corpus = {kind: [] for kind in DEFAULT_CORPUS}
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            req_type = entry["request"].get("requestType", "init_next")
+            if "diagnose" in req_type:
+                kind = "diagnose"
+            elif req_type == "init_auto":
+                kind = "plan"
+            elif req_type == "init_auto_one":
+                kind = "decision"
+            else:
+                kind = "tactic"
+            corpus[kind].extend(entry["responses"])
+    return {kind: responses or DEFAULT_CORPUS[kind] for kind, responses in corpus.items()}
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def enter(self, limit):
+        """Admits one request unless `limit` requests are already running."""
+        with self.lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters, in_flight=self.in_flight, peak_in_flight=self.peak_in_flight)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.stats.inc("connections")
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=()):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stats.inc(f"status_{status}")
+
+    def send_error_json(self, status, message, error_type, headers=()):
+        self.send_json(status, {"error": {"message": message, "type": error_type, "code": error_type}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.server.stats.snapshot())
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "not_found")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error_json(404, f"Unknown path {self.path}", "not_found")
+            return
+
+        options, stats = self.server.options, self.server.stats
+        stats.inc("requests")
+        if not stats.enter(options.max_concurrency):
+            self.send_error_json(429, "Too many concurrent requests (stub)", "rate_limit_exceeded",
+                                 [("Retry-After", str(options.retry_after))])
+            return
+        try:
+            roll = random.random()
+            if roll < options.rate_limit_rate:
+                self.send_error_json(429, "Rate limit exceeded (stub)", "rate_limit_exceeded",
+                                     [("Retry-After", str(options.retry_after))])
+                return
+            roll -= options.rate_limit_rate
+            if roll < options.error_rate:
+                time.sleep(self.server.latency() / 2)
+                self.send_error_json(500, "Injected server error (stub)", "server_error")
+                return
+            roll -= options.error_rate
+            if roll < options.hang_rate:
+                stats.inc("hangs")
+                time.sleep(options.hang_seconds)
+
+            messages = body.get("messages", [])
+            prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+            contents = [self.server.pick_response(messages) for _ in range(int(body.get("n") or 1))]
+            if body.get("stream"):
+                self.stream(body, contents[0], prompt_tokens)
+            else:
+                completion_tokens = sum(estimate_tokens(c) for c in contents)
+                time.sleep(self.server.latency() + completion_tokens / options.tokens_per_sec)
+                self.send_json(200, {
+                    "id": f"chatcmpl-stub-{time.time_ns()}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [
+                        {"index": i, "message": {"role": "assistant", "content": c}, "finish_reason": "stop"}
+                        for i, c in enumerate(contents)
+                    ],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            stats.inc("client_aborts")
+            self.close_connection = True
+        finally:
+            stats.leave()
+
+    def stream(self, body, content, prompt_tokens):
+        """Sends `content` as SSE chunks of about one token each, paced at
+        `--tokens-per-sec` after the first-token latency."""
+        options = self.server.options
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.server.stats.inc("status_200")
+        self.server.stats.inc("streams")
+        base = {"id": f"chatcmpl-stub-{time.time_ns()}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "stub")}
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(self.server.latency())
+        send_event(json.dumps(dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])))
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        for piece in pieces:
+            time.sleep(1 / options.tokens_per_sec)
+            send_event(json.dumps(dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]), ensure_ascii=False))
+        send_event(json.dumps(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                     "total_tokens": prompt_tokens + len(pieces)}
+            send_event(json.dumps(dict(base, choices=[], usage=usage)))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        self.options = options
+        self.stats = Stats()
+        self.corpus = load_corpus(options.corpus)
+        self.latency = parse_latency(options.latency)
+        super().__init__(address, StubHandler)
+
+    def pick_response(self, messages):
+        text = "\n".join(str(m.get("content", "")) for m in messages)
+        kind = next((kind for marker, kind in KIND_MARKERS if marker in text), "tactic")
+        return random.choice(self.corpus[kind])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:300", help="Time to first token distribution (ms)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0, help="Generation speed after the first token")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests delayed by --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=200.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Requests beyond this many in flight get 429 (0: unlimited)")
+    parser.add_argument("--corpus", help="JSON response lists or a recorded JSONL corpus")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    options = parser.parse_args()
+    random.seed(options.seed)
+
+    server = StubServer((options.host, options.port), options)
+    print(f"Stub chat-completions server on http://{options.host}:{server.server_address[1]}/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot()), file=sys.stderr)
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import re
+
+IDENT_RE = re.compile(r"(?<![\w'✝.])[^\W\d][\w'✝!?]*")
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def context_tokens(context):
+    return sum(estimate_tokens(v) for v in context.values() if isinstance(v, str))
+
+def _goal_entries(goal_state):
+    """Splits a pretty-printed goal into hypothesis entries and the target block,
+    keeping each entry's original lines (continuation lines stay attached)."""
+    entries, target = [], []
+    for line in goal_state.split("\n"):
+        if target or line.startswith("⊢"):
+            target.append(line)
+        elif line[:1].isspace() and entries:
+            entries[-1].append(line)
+        else:
+            entries.append([line])
+    return entries, target
+
+def _split_hypothesis(entry):
+    head = entry[0]
+    if " : " not in head or head.startswith("case "):
+        return None, None
+    names, rest = head.split(" : ", 1)
+    if not all(IDENT_RE.fullmatch(n) for n in names.split()):
+        return None, None
+    return names.split(), "\n".join([rest] + entry[1:])
+
+def collapse_goal_state(goal_state):
+    """Merges adjacent hypotheses with the same type (`a : ℕ`, `b : ℕ` -> `a b : ℕ`)
+    and keeps one copy of inaccessible hypotheses (`inst✝¹ : Foo`) whose type repeats."""
+    entries, target = _goal_entries(goal_state)
+    out = []
+    seen_inaccessible = set()
+    prev_names, prev_type = None, None
+    for entry in entries:
+        names, htype = _split_hypothesis(entry)
+        if names is None:
+            out.append(entry)
+            prev_names = None
+            continue
+        if all("✝" in n for n in names):
+            if htype in seen_inaccessible:
+                continue
+            seen_inaccessible.add(htype)
+        if prev_names is not None and htype == prev_type and "\n" not in htype:
+            prev_names.extend(names)
+            out[-1] = [f"{' '.join(prev_names)} : {htype}"]
+            continue
+        out.append(entry)
+        prev_names, prev_type = list(names), htype
+    return "\n".join(["\n".join(e) for e in out] + target)
+
+def prune_goal_state(goal_state, extra_mentions=""):
+    """Drops hypotheses unrelated to the target. A hypothesis is kept when one of
+    its names occurs in the target (or in `extra_mentions`, e.g. the error
+    message), when its type mentions a kept hypothesis, or when a kept
+    hypothesis mentions it.
+
+    A target that mentions no hypothesis (e.g. `⊢ False` in a proof by
+    contradiction) gives no clue which ones matter, so then all are kept."""
+    entries, target = _goal_entries(goal_state)
+    parsed = [(entry,) + _split_hypothesis(entry) for entry in entries]
+    declared = {n for _, names, _ in parsed if names for n in names}
+    if not declared & set(IDENT_RE.findall("\n".join(target))):
+        return goal_state
+    wanted = set(IDENT_RE.findall("\n".join(target) + "\n" + extra_mentions))
+    keep = [names is None for _, names, _ in parsed]
+    kept_names = set()
+
+    changed = True
+    while changed:
+        changed = False
+        for i, (_, names, htype) in enumerate(parsed):
+            if keep[i]:
+                continue
+            mentioned = set(IDENT_RE.findall(htype))
+            if wanted & set(names) or mentioned & kept_names:
+                keep[i] = True
+                kept_names.update(names)
+                wanted |= mentioned
+                changed = True
+    kept = [e for (e, _, _), k in zip(parsed, keep) if k]
+    return "\n".join(["\n".join(e) for e in kept] + target)
+
+def truncate_search_results(search_results, top_k):
+    lines = [l for l in search_results.split("\n") if l.strip()]
+    if len(lines) <= top_k:
+        return search_results
+    return "\n".join(lines[:top_k] + [f"... ({len(lines) - top_k} more results omitted)"])
+
+def fit_context(context, budget, search_top_k=10):
+    """Shrinks `context` in place until its variable fields fit in `budget` tokens.
+
+    Lossless steps always run; pruning hypotheses and cutting search results
+    further only happen while the context is still over budget. Returns the
+    token accounting for the request.
+    """
+    before = context_tokens(context)
+    goal_state = context["goal_state"]
+    search_results = context["search_results"]
+    context["goal_state"] = collapse_goal_state(goal_state)
+    context["search_results"] = truncate_search_results(search_results, search_top_k)
+
+    if context_tokens(context) > budget:
+        mentions = " ".join(context.get(k, "") for k in ("error_msg", "prev_tactic", "hint", "diagnosis"))
+        context["goal_state"] = collapse_goal_state(prune_goal_state(goal_state, mentions))
+
+    top_k = search_top_k
+    while context_tokens(context) > budget and top_k > 1:
+        top_k //= 2
+        context["search_results"] = truncate_search_results(search_results, top_k)
+
+    after = context_tokens(context)
+    return {"before": before, "after": after, "saved": before - after}
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from utils import log_message, getenv, CACHE_FILE
+from goals import canonicalize_goal, normalize_goal, goal_shingles, minhash_signature, lsh_buckets, signature_similarity, pack_signature, unpack_signature
+
+CACHE_DB = "llm_cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tactics (
+    key TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    work_type TEXT,
+    goal TEXT,
+    hint TEXT,
+    created REAL DEFAULT (strftime('%s', 'now'))
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    key TEXT PRIMARY KEY,
+    sig BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tactics_code ON tactics (code);
+CREATE TABLE IF NOT EXISTS failures (
+    goal_key TEXT NOT NULL,
+    tactic TEXT NOT NULL,
+    error_class TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (goal_key, tactic)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS failures_created ON failures (created);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class SQLiteStore:
+    """SQLite database in WAL mode, with one connection per thread.
+
+    WAL lets readers proceed while another process writes, and every write is
+    its own short transaction, so parallel Lean workers never overwrite each
+    other's entries.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(self.schema)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)
+
+class CacheManager:
+    def __init__(self, db_path=None):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.db_path = db_path or getenv("LLM_CACHE_DB") or os.path.join(base_dir, CACHE_DB)
+        self.legacy_file = os.path.join(base_dir, CACHE_FILE)
+        self.store = SQLiteStore(self.db_path, SCHEMA)
+        self._migrated = False
+        self.failure_ttl = float(getenv("LLM_FAILURE_TTL", 7 * 24 * 3600))
+        self.failure_max = int(getenv("LLM_FAILURE_MAX", 10000))
+
+    def _ensure_migrated(self):
+        """Imports the legacy JSON cache once. A locked database is retried on
+        the next call; any other failure is only reported."""
+        if self._migrated:
+            return
+        if not os.path.exists(self.legacy_file):
+            self._migrated = True
+            return
+        conn = self.store.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT 1 FROM meta WHERE name = 'json_migrated'").fetchone()
+            if not done:
+                with open(self.legacy_file, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tactics (key, code) VALUES (?, ?)",
+                    [(k, v) for k, v in legacy.items() if isinstance(v, str)]
+                )
+                conn.execute("INSERT INTO meta (name, value) VALUES ('json_migrated', ?)", (str(len(legacy)),))
+                log_message(f"📦 Migrated {len(legacy)} entries from {CACHE_FILE} to {CACHE_DB}")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._migrated = not isinstance(e, sqlite3.OperationalError)
+            log_message(f"⚠️ Failed to migrate {CACHE_FILE}: {e}", level="WARNING")
+            return
+        self._migrated = True
+        try:
+            os.replace(self.legacy_file, self.legacy_file + ".migrated")
+        except OSError:
+            pass
+
+    def _remote(self):
+        """The shared L2 cache, imported only when `LLM_L2_CACHE_URL` is set."""
+        if not getenv("LLM_L2_CACHE_URL"):
+            return None
+        from remote_cache import get_remote_cache
+        return get_remote_cache()
+
+    def _generate_key(self, goal, hint, work_type):
+        """Exact-hit key. Hypothesis names stay in it since the cached tactic
+        refers to them; only the similarity index uses the fully canonical goal."""
+        g = normalize_goal(goal)
+        h = " ".join((hint or "None").split())
+        w = (work_type or "").strip()
+        raw_key = f"{g}||{h}||{w}"
+        return hashlib.md5(raw_key.encode('utf-8')).hexdigest()
+
+    def _legacy_key(self, goal, hint, work_type):
+        raw_key = f"{(goal or '').strip()}||{(hint or 'None').strip()}||{(work_type or '').strip()}"
+        return hashlib.md5(raw_key.encode('utf-8')).hexdigest()
+
+    def get(self, goal, hint, work_type):
+        key = self._generate_key(goal, hint, work_type)
+        legacy = self._legacy_key(goal, hint, work_type)
+        try:
+            self._ensure_migrated()
+            row = self.store.execute(
+                "SELECT code FROM tactics WHERE key IN (?, ?) ORDER BY key = ? DESC LIMIT 1", (key, legacy, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Cache lookup failed: {e}", level="WARNING")
+            return None
+        if row:
+            log_message(f"⚡ Cache Hit for [{work_type}]")
+            return row[0]
+
+        remote = self._remote()
+        if remote is None:
+            return None
+        entries = remote.mget([key, legacy])
+        entry = entries.get(key) or entries.get(legacy)
+        if not entry:
+            return None
+        log_message(f"⚡ Shared Cache Hit for [{work_type}]")
+        self.set(goal, hint, work_type, entry["code"], share=False)
+        return entry["code"]
+
+    def set(self, goal, hint, work_type, code, share=True):
+        """Stores a verified tactic locally and, when `share` is set, queues it
+        for the shared cache."""
+        key = self._generate_key(goal, hint, work_type)
+        signature = minhash_signature(goal_shingles(canonicalize_goal(goal)))
+        conn = self.store.connect()
+        try:
+            self._ensure_migrated()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO tactics (key, code, work_type, goal, hint) VALUES (?, ?, ?, ?, ?)",
+                (key, code, work_type, goal, hint)
+            )
+            conn.execute(
+                "DELETE FROM failures WHERE goal_key = ? AND tactic = ?", (self._failure_key(goal), normalize_tactic(code))
+            )
+            if signature:
+                conn.execute("INSERT OR REPLACE INTO signatures (key, sig) VALUES (?, ?)", (key, pack_signature(signature)))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO lsh (band, bucket, key) VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in lsh_buckets(signature)]
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            log_message(f"⚠️ Failed to save cache: {e}", level="WARNING")
+            return
+        log_message(f"💾 Cached success for [{work_type}]")
+        remote = self._remote() if share else None
+        if remote is not None:
+            remote.put({"key": key, "code": code, "work_type": work_type, "goal": goal, "hint": hint})
+
+    def known_tactics(self, codes):
+        """Returns the subset of `codes` that is already stored as a verified tactic."""
+        if not codes:
+            return set()
+        try:
+            rows = self.store.execute(
+                f"SELECT DISTINCT code FROM tactics WHERE code IN ({', '.join('?' * len(codes))})", codes
+            ).fetchall()
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Cache lookup failed: {e}", level="WARNING")
+            return set()
+        return {row[0] for row in rows}
+
+    def similar(self, goal, k=3, min_similarity=0.3):
+        """Returns up to `k` cached `(goal, tactic, similarity)` triples whose goals resemble `goal`."""
+        signature = minhash_signature(goal_shingles(canonicalize_goal(goal)))
+        if not signature or k <= 0:
+            return []
+        buckets = lsh_buckets(signature)
+        clause = " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets))
+        params = [x for pair in buckets for x in pair]
+        try:
+            rows = self.store.execute(
+                f"SELECT t.goal, t.code, s.sig FROM tactics t JOIN signatures s ON s.key = t.key "
+                f"WHERE t.key IN (SELECT DISTINCT key FROM lsh WHERE {clause})", params
+            ).fetchall()
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Similarity lookup failed: {e}", level="WARNING")
+            return []
+        scored = [(g, code, signature_similarity(signature, unpack_signature(sig))) for g, code, sig in rows]
+        scored = [item for item in scored if item[2] >= min_similarity]
+        scored.sort(key=lambda item: -item[2])
+        return scored[:k]
+
+    def _failure_key(self, goal):
+        # Like the exact-hit key, keeps hypothesis names: `exact h.symm` failing
+        # on `hab : a = b ⊢ b = a` says nothing about `h : a = b ⊢ b = a`.
+        return hashlib.md5(normalize_goal(goal).encode('utf-8')).hexdigest()
+
+    def add_failure(self, goal, tactic, error_class, error):
+        """Remembers that `tactic` failed on `goal` (up to renaming), keeping at
+        most `LLM_FAILURE_MAX` entries younger than `LLM_FAILURE_TTL` seconds."""
+        now = time.time()
+        conn = self.store.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO failures (goal_key, tactic, error_class, error, created) VALUES (?, ?, ?, ?, ?)",
+                (self._failure_key(goal), normalize_tactic(tactic), error_class, error, now)
+            )
+            conn.execute("DELETE FROM failures WHERE created < ?", (now - self.failure_ttl,))
+            conn.execute(
+                "DELETE FROM failures WHERE (goal_key, tactic) IN "
+                "(SELECT goal_key, tactic FROM failures ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.failure_max,)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            log_message(f"⚠️ Failed to save failure: {e}", level="WARNING")
+            return
+        log_message(f"🚫 Recorded failed tactic [{error_class}]")
+
+    def failures(self, goal):
+        """Returns `{normalized tactic: (error_class, error)}` of the unexpired
+        failures recorded for `goal`, newest first."""
+        try:
+            rows = self.store.execute(
+                "SELECT tactic, error_class, error FROM failures WHERE goal_key = ? AND created >= ? ORDER BY created DESC",
+                (self._failure_key(goal), time.time() - self.failure_ttl)
+            ).fetchall()
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Failure lookup failed: {e}", level="WARNING")
+            return {}
+        return {tactic: (error_class, error) for tactic, error_class, error in rows}
+
+def normalize_tactic(tactic):
+    return " ".join((tactic or "").split())
@@ -0,0 +1,139 @@
+"""Shared tactic cache server (the L2 tier behind `CacheManager`).
+
+Stores verified tactics under the same keys as the local cache, in a SQLite
+database, and serves them over HTTP:
+
+    POST /mget  {"keys": [...]}                              -> {"entries": {key: entry}}
+    POST /mput  {"entries": [{"key", "code", "work_type", "goal", "hint"}]}  -> {"stored": n}
+    GET  /stats                                               -> counters
+
+    python cache_server.py --port 8900 --db team_cache.db [--token SECRET]
+    LLM_L2_CACHE_URL=http://cache-host:8900 python service.py ...
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cache import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_tactics (
+    key TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    work_type TEXT,
+    goal TEXT,
+    hint TEXT,
+    created REAL NOT NULL
+);
+"""
+
+MAX_BATCH = 1000
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def authorized(self):
+        if not self.server.token:
+            return True
+        return self.headers.get("Authorization") == f"Bearer {self.server.token}"
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        count = self.server.store.execute("SELECT COUNT(*) FROM shared_tactics").fetchone()[0]
+        self.send_json(200, dict(self.server.snapshot(), entries=count))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if not self.authorized():
+            self.send_json(401, {"error": "Unauthorized"})
+            return
+
+        path = self.path.rstrip("/")
+        if path == "/mget":
+            keys = [str(k) for k in body.get("keys", [])][:MAX_BATCH]
+            rows = self.server.store.execute(
+                f"SELECT key, code, work_type, goal, hint FROM shared_tactics WHERE key IN ({', '.join('?' * len(keys))})", keys
+            ).fetchall() if keys else []
+            entries = {key: {"code": code, "work_type": work_type, "goal": goal, "hint": hint}
+                       for key, code, work_type, goal, hint in rows}
+            self.server.count(lookups=len(keys), hits=len(entries))
+            self.send_json(200, {"entries": entries})
+        elif path == "/mput":
+            now = time.time()
+            rows = [
+                (str(e["key"]), e["code"], e.get("work_type"), e.get("goal"), e.get("hint"), now)
+                for e in body.get("entries", [])[:MAX_BATCH]
+                if e.get("key") and isinstance(e.get("code"), str) and e["code"].strip()
+            ]
+            conn = self.server.store.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO shared_tactics (key, code, work_type, goal, hint, created) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+            self.server.count(writes=len(rows))
+            self.send_json(200, {"stored": len(rows)})
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db_path, token=None, verbose=False):
+        self.store = SQLiteStore(db_path, SCHEMA)
+        self.token = token
+        self.verbose = verbose
+        self.counters = {"lookups": 0, "hits": 0, "writes": 0}
+        self.lock = threading.Lock()
+        super().__init__(address, CacheRequestHandler)
+
+    def count(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the shared tactic cache.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--db", default="team_cache.db")
+    parser.add_argument("--token", default=None, help="Require `Authorization: Bearer <token>`")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = CacheServer((args.host, args.port), args.db, args.token, args.verbose)
+    print(f"Shared tactic cache on http://{args.host}:{server.server_address[1]} ({args.db})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,91 @@
 import os
 import json
 import re
+import hashlib
+import tempfile
 import textwrap
-from utils import CacheManager, log_message, extract_context_from_source, find_code, getenv
-from providers import PromptManager, CustomOpenAIProvider, MockLLMProvider
+import time
+import threading
+import concurrent.futures
+from contextlib import contextmanager
+from utils import log_message, extract_context_from_source, find_code, getenv, perform_lean_search, classify_error
+from cache import CacheManager, normalize_tactic
+from goals import hypothesis_names
+from errors import LLMError, DeadlineExceeded
+from deadline import start_deadline, finish_deadline, current_deadline, time_left, charge_stage
+from budget import fit_context
+from sessions import SessionStore
+from prefetch import PrefetchCache, plan_requests, prefetch_key
+from singleflight import SingleFlight
+from providers import PromptManager, create_provider
+from metrics import metrics, start_span, finish_span, observe_stage, annotate, record_cache, record_error
+
+# Stages that do not start once the request's deadline has passed.
+DEADLINE_STAGES = ("context", "render", "provider")
+# How close a cached goal must be for its tactic to stand in after the deadline.
+DEGRADED_MIN_SIMILARITY = 0.9
 
 class LLMCore:
-    def __init__(self):
+    def __init__(self, prefetch=None):
         self.cache_manager = CacheManager()
         self.prompt_manager = PromptManager()
-        
-        provider_name = getenv("LLM_PROVIDER", "openai").lower()
-        if provider_name == "mock":
-            self.provider = MockLLMProvider()
-        else:
-            self.provider = CustomOpenAIProvider()
+        self._provider = None
+        self._provider_lock = threading.Lock()
+        self._record_lock = threading.Lock()
+        self.stage_listeners = [observe_stage, charge_stage]
+        self._executor = None
+        self.stable_layout = getenv("LLM_PROMPT_LAYOUT", "classic") == "stable"
+        self.sessions = SessionStore(max_tokens=int(getenv("LLM_SESSION_MAX_TOKENS", 12000)))
+        if prefetch is None:
+            prefetch = str(getenv("LLM_PREFETCH", "false")).lower() in ("1", "true")
+        self.prefetch_enabled = prefetch
+        self.prefetched = PrefetchCache(ttl=float(getenv("LLM_PREFETCH_TTL", 120)))
+        self._prefetch_executor = None
+        self.singleflight = None
+        if str(getenv("LLM_SINGLEFLIGHT", "true")).lower() in ("1", "true"):
+            self.singleflight = SingleFlight(
+                getenv("LLM_SINGLEFLIGHT_DIR") or os.path.join(tempfile.gettempdir(), "llm-singleflight"),
+                wait=float(getenv("LLM_SINGLEFLIGHT_WAIT", 300))
+            )
+
+    @contextmanager
+    def stage(self, name):
+        """Times one pipeline stage and reports it to `stage_listeners` as `(name, seconds)`.
+        Deadline-bound stages raise `DeadlineExceeded` instead of starting late."""
+        deadline = current_deadline()
+        if deadline is not None and name in DEADLINE_STAGES:
+            deadline.check(name)
+        if not self.stage_listeners:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            for listener in self.stage_listeners:
+                listener(name, elapsed)
+
+    def record(self, req, responses):
+        """Appends the request and the raw provider responses to `LLM_RECORD_FILE`
+        (if set), building the corpus used by `bench/replay.py`."""
+        path = getenv("LLM_RECORD_FILE")
+        if not path:
+            return
+        line = json.dumps({"request": req, "responses": responses}, ensure_ascii=False)
+        try:
+            with self._record_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            log_message(f"⚠️ Could not record request: {e}", level="WARNING")
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            with self._provider_lock:
+                if self._provider is None:
+                    self._provider = create_provider(getenv("LLM_PROVIDER", "openai").lower())
+        return self._provider
 
     def handle_caching_report(self, req):
         goal = req.get("goalState")
@@ -27,12 +98,26 @@ class LLMCore:
         else:
             return {"success": False, "message": "Tactic with only trivial `sorry` is not cached", "tactic": ""}
 
+    def handle_failure_report(self, req):
+        code = req.get("prevTactic") or ""
+        if not code.strip():
+            return {"success": False, "message": "No tactic to record", "tactic": ""}
+        error = req.get("errorMsg") or ""
+        error_class = classify_error(error)
+        metrics.inc("llm_tactic_failures_total", error_class=error_class)
+        self.cache_manager.add_failure(req.get("goalState"), code, error_class, error[:2000])
+        return {"success": True, "message": "Failure recorded", "tactic": ""}
+
     def check_cache_hit(self, req):
         req_type = req.get("requestType", "init_next")
         parts = req_type.split('_', 1)
         work_type_suffix = parts[1] if len(parts) > 1 else req_type
         
         cached_code = self.cache_manager.get(req.get("goalState"), req.get("hint"), work_type_suffix)
+        if cached_code and normalize_tactic(cached_code) in self.cache_manager.failures(req.get("goalState")):
+            log_message(f"🚫 Cached tactic for [{work_type_suffix}] is a known failure here, ignoring it")
+            cached_code = None
+        record_cache(work_type_suffix, bool(cached_code))
         if cached_code:
             return {
                 "tactic": cached_code,
@@ -43,8 +128,46 @@ class LLMCore:
             }
         return None
 
-    def prepare_context(self, req):
-        thm_decl, implicit_hint = extract_context_from_source(req.get("source"), req.get("pos"))
+    def find_examples(self, req):
+        req_type = req.get("requestType", "init_next")
+        k = int(getenv("LLM_FEWSHOT_K", 3))
+        if not req_type.startswith("init_") or req_type.startswith("init_auto") or k <= 0:
+            return ""
+
+        similar = self.cache_manager.similar(req.get("goalState"), k=k)
+        if not similar:
+            return ""
+        log_message(f"🔎 Found {len(similar)} similar cached goals for few-shot")
+        blocks = [
+            f"Goal (similarity {score:.2f}):\n{goal}\nTactic:\n```lean\n{code}\n```"
+            for goal, code, score in similar
+        ]
+        return "[Similar Solved Goals]:\n" + "\n\n".join(blocks) + "\n\n"
+
+    def find_failures(self, req):
+        """Returns the failures recorded for this goal, for requests that answer
+        with a tactic (not diagnose or planning)."""
+        req_type = req.get("requestType", "init_next")
+        if "diagnose" in req_type or req_type.startswith("init_auto"):
+            return {}
+        return self.cache_manager.failures(req.get("goalState"))
+
+    def format_failures(self, failures, req):
+        k = int(getenv("LLM_FAILURE_CONTEXT_K", 5))
+        prev = normalize_tactic(req.get("prevTactic"))
+        tried = [(tactic, info) for tactic, info in failures.items() if tactic != prev][:k]
+        if not tried:
+            return ""
+        lines = []
+        for tactic, (error_class, error) in tried:
+            first_line = next((l.strip() for l in (error or "").split("\n") if l.strip()), "no message")
+            lines.append(f"- `{tactic}` ({error_class}: {first_line[:200]})")
+        return "[Already Tried (failed on this goal, do not suggest again)]:\n" + "\n".join(lines) + "\n\n"
+
+    def build_context(self, req):
+        with self.stage("extract"):
+            thm_decl, implicit_hint = extract_context_from_source(req.get("source"), req.get("pos"))
+        failures = self.find_failures(req)
         return {
             "goal_state": req.get("goalState") or "No goal state.",
             "thm_decl": thm_decl or "Unknown Theorem.",
@@ -52,23 +175,160 @@ class LLMCore:
             "prev_tactic": req.get("prevTactic") or "None",
             "error_msg": re.sub(r"\S+\.lean:\d+:\d+:\s*", "", req.get("errorMsg") or "None"),
             "diagnosis": req.get("diagnosisInfo") or "None",
-            "search_results": req.get("searchResults") or "No search results."
+            "search_results": req.get("searchResults") or "No search results.",
+            "examples": self.find_examples(req),
+            "tried": self.format_failures(failures, req),
+            "_failures": failures
         }
 
-    def receive_llm_request(self, req, context):
+    def fit_context(self, context):
+        usage = fit_context(
+            context, int(getenv("LLM_CONTEXT_BUDGET", 6000)), int(getenv("LLM_SEARCH_TOP_K", 10))
+        )
+        if usage["saved"] > 0:
+            log_message(f"✂️ Prompt context trimmed {usage['before']} -> {usage['after']} tokens (saved {usage['saved']})")
+        context["_budget"] = usage
+        return context
+
+    def prepare_context(self, req):
+        return self.fit_context(self.build_context(req))
+
+    def template_names(self, req):
         req_type = req.get("requestType", "init_next")
         if "diagnose" in req_type:
             system_tpl = "system_diagnose"
         else:
             parts = req_type.split('_', 1)
             system_tpl = f"system_{parts[1]}" if len(parts) == 2 else "system_next"
-        
-        user_tpl = req_type
+        return system_tpl, req_type
+
+    def build_prompts(self, req, context):
+        system_tpl, user_tpl = self.template_names(req)
         system_prompt = self.prompt_manager.render(system_tpl, context)
         user_prompt = self.prompt_manager.render(user_tpl, context)
-        raw_response = self.provider.generate(system_prompt, user_prompt)
+        return system_prompt, user_prompt
+
+    def build_messages(self, req, context):
+        """Returns `(system, user, history, session)`.
+
+        With `LLM_PROMPT_LAYOUT=stable` the system prompt carries only the
+        theorem, the theorem's earlier turns follow unchanged, and the request's
+        own instructions, goal and volatile fields come last, so init, diagnose
+        and fix calls for one theorem share a growing prefix that providers can
+        serve from their prompt cache.
+        """
+        if not self.stable_layout:
+            system_prompt, user_prompt = self.build_prompts(req, context)
+            return system_prompt, user_prompt, None, None
+
+        system_tpl, user_tpl = self.template_names(req)
+        session = self.sessions.get(context["thm_decl"])
+        system_prompt = self.prompt_manager.render("system_session", context)
+        turn_context = dict(context, thm_decl="(see [Full Theorem] in the system prompt)")
+        user_prompt = (
+            self.prompt_manager.render(system_tpl, context) + "\n\n---\n\n"
+            + self.prompt_manager.render(user_tpl, turn_context)
+        )
+        return system_prompt, user_prompt, session.history(), session
+
+    def coalesce(self, req_type, messages, n, call):
+        """Runs `call` through the single-flight layer, keyed on the model, the
+        request type and the rendered messages. Returns `(value, shared)`."""
+        if self.singleflight is None:
+            return call(), None
+        model = getattr(self.provider, "model_name", type(self.provider).__name__)
+        raw_key = json.dumps([model, req_type, n, messages], ensure_ascii=False)
+        value, shared = self.singleflight.do(hashlib.sha256(raw_key.encode("utf-8")).hexdigest(), call)
+        if shared:
+            metrics.inc("llm_coalesced_total", request_type=req_type, scope=shared)
+            annotate(coalesced=shared)
+            log_message(f"🔗 Joined an identical in-flight [{req_type}] request ({shared})")
+        return value, shared
+
+    def receive_llm_request(self, req, context):
+        req_type = req.get("requestType", "init_next")
+        with self.stage("render"):
+            system_prompt, user_prompt, history, session = self.build_messages(req, context)
+        with self.stage("provider"):
+            raw_response, shared = self.coalesce(
+                req_type, [system_prompt, user_prompt, history], 1,
+                lambda: self.provider.generate(
+                    system_prompt, user_prompt, stop_when=lambda text: self.is_response_complete(req_type, text),
+                    request_type=req_type, history=history
+                )
+            )
+        if session is not None and not shared:
+            session.append(user_prompt, raw_response)
         return raw_response
 
+    def receive_llm_candidates(self, req, context, n):
+        req_type = req.get("requestType", "init_next")
+        with self.stage("render"):
+            system_prompt, user_prompt, history, session = self.build_messages(req, context)
+        with self.stage("provider"):
+            raw_responses, shared = self.coalesce(
+                req_type, [system_prompt, user_prompt, history], n,
+                lambda: self.provider.generate_many(
+                    system_prompt, user_prompt, n, stop_when=lambda text: self.is_response_complete(req_type, text),
+                    request_type=req_type, history=history
+                )
+            )
+        if session is not None and raw_responses and not shared:
+            session.append(user_prompt, raw_responses[0])
+        return raw_responses
+
+    def is_response_complete(self, req_type, partial):
+        """Decides, on a partially streamed response, whether `report_llm_response`
+        already has everything it will use."""
+        if "diagnose" in req_type:
+            return re.search(r'ANALYSIS:.+?SEARCH:[^\S\n]*\S[^\n]*\n', partial, re.DOTALL | re.IGNORECASE) is not None
+
+        visible = re.sub(r'<think>.*?</think>', '', partial, flags=re.DOTALL)
+        if "<think>" in visible:
+            visible = visible[:visible.index("<think>")]
+
+        if req_type == "init_auto" or req_type == "init_auto_one":
+            for match in re.finditer(r'```json\s*\n(.*?)\n```', visible, re.DOTALL):
+                try:
+                    json.loads(match.group(1))
+                    return True
+                except ValueError:
+                    continue
+            return False
+
+        for match in re.finditer(r'```(\w*)\s*\n(.*?)\n```', visible, re.DOTALL):
+            if match.group(1) == "lean" or "GIVEUP" in match.group(2):
+                return True
+        return False
+
+    def rank_candidates(self, tactics):
+        """Deduplicates tactics up to whitespace and orders them: already verified
+        somewhere in the cache first, then by how many samples agreed, then shortest."""
+        votes, first_seen = {}, {}
+        for tactic in tactics:
+            norm = " ".join(tactic.split())
+            if not norm:
+                continue
+            votes[norm] = votes.get(norm, 0) + 1
+            first_seen.setdefault(norm, tactic)
+        known = self.cache_manager.known_tactics(list(first_seen.values()))
+        ranked = sorted(
+            first_seen,
+            key=lambda norm: (first_seen[norm] not in known, -votes[norm], len(norm))
+        )
+        return [first_seen[norm] for norm in ranked]
+
+    def error_response(self, error):
+        record_error(error.kind, str(error))
+        return {
+            "tactic": "",
+            "searchQuery": None,
+            "analysis": None,
+            "success": False,
+            "message": str(error),
+            "errorType": error.kind
+        }
+
     def report_llm_response(self, req_type, raw_response):
         response_data = {
             "tactic": "",
@@ -102,7 +362,7 @@ class LLMCore:
                 response_data["message"] = "Plan Generated"
                 return response_data
             except Exception as e:
-                log_message(f"❌ JSON Parse Error in {req_type}: {e}")
+                log_message(f"❌ JSON Parse Error in {req_type}: {e}", level="ERROR")
                 if req_type == "init_auto_one":
                      response_data["analysis"] = json.dumps({"action": "next", "hint": "Fallback: JSON parse error"})
                 else:
@@ -124,17 +384,234 @@ class LLMCore:
             return response_data
 
     def process_full_request(self, req):
+        span = start_span(req.get("requestType", "init_next"))
+        deadline = start_deadline(
+            req.get("deadlineMs") or getenv("LLM_DEADLINE_MS"), float(getenv("LLM_DEADLINE_RESERVE_MS", 100))
+        )
+        outcome = "met"
+        try:
+            result = self._process_request(req)
+        except DeadlineExceeded as e:
+            outcome = "degraded"
+            result = self.degraded_response(req, e)
+        except Exception as e:
+            record_error("exception", str(e))
+            raise
+        finally:
+            finish_deadline(deadline)
+            if deadline is not None:
+                metrics.inc("llm_deadline_total", request_type=span.request_type, outcome=outcome)
+                annotate(budget=deadline.to_dict(outcome))
+            finish_span(span)
+        if deadline is not None:
+            result = dict(result, budget=deadline.to_dict(outcome))
+        return result
+
+    def degraded_response(self, req, error):
+        """The best answer once the deadline has passed: for tactic requests the
+        cached tactic of a near-identical goal with the same hypothesis names
+        (tactics refer to them) that is not a known failure here, otherwise a
+        structured timeout. Lean still checks the tactic before using it."""
+        req_type = req.get("requestType", "init_next")
+        record_error(error.kind, str(error))
+        log_message(f"⏱️ {error} [{req_type}], degrading", level="WARNING")
+        response = {
+            "tactic": "",
+            "searchQuery": None,
+            "analysis": None,
+            "success": False,
+            "message": str(error),
+            "errorType": error.kind,
+            "degraded": True
+        }
+        goal_state = req.get("goalState")
+        if not goal_state or "diagnose" in req_type or req_type.startswith(("init_auto", "report_")):
+            return response
+        failures = self.cache_manager.failures(goal_state)
+        names = hypothesis_names(goal_state)
+        for goal, code, score in self.cache_manager.similar(goal_state, k=3, min_similarity=DEGRADED_MIN_SIMILARITY):
+            if hypothesis_names(goal) == names and normalize_tactic(code) not in failures:
+                return dict(response, tactic=code, success=True,
+                            message=f"Deadline reached; closest cached tactic (similarity {score:.2f})")
+        return response
+
+    def _process_request(self, req):
         req_type = req.get("requestType", "init_next")
         
         if req_type == "report_success":
-            return self.handle_caching_report(req)
+            self.record(req, [])
+            with self.stage("cache"):
+                return self.handle_caching_report(req)
+
+        if req_type == "report_failure":
+            self.record(req, [])
+            with self.stage("cache"):
+                return self.handle_failure_report(req)
         
         if req_type.startswith("init_"):
-            cache_result = self.check_cache_hit(req)
-            if cache_result: return cache_result
+            with self.stage("cache"):
+                cache_result = self.check_cache_hit(req)
+            if cache_result:
+                self.record(req, [])
+                return cache_result
+            prefetched = self.claim_prefetch(req)
+            if prefetched is not None:
+                return prefetched
 
-        context = self.prepare_context(req)
-        raw_response = self.receive_llm_request(req, context)
-        final_result = self.report_llm_response(req_type, raw_response)
-        
-        return final_result
\ No newline at end of file
+        if req_type.startswith("repair_"):
+            return self.process_repair(req)
+
+        with self.stage("context"):
+            context = self.prepare_context(req)
+        return self.generate_response(req, context)
+
+    def generate_response(self, req, context):
+        req_type = req.get("requestType", "init_next")
+        n = int(req.get("candidates") or getenv("LLM_CANDIDATES", 1))
+        if n > 1 and "diagnose" not in req_type and not req_type.startswith("init_auto"):
+            return self.process_candidates(req, context, n)
+
+        try:
+            raw_response = self.receive_llm_request(req, context)
+        except DeadlineExceeded:
+            raise
+        except LLMError as e:
+            return self.error_response(e)
+        self.record(req, [raw_response])
+        with self.stage("parse"):
+            final_result = self.report_llm_response(req_type, raw_response)
+        if req_type == "init_auto" and final_result["message"] == "Plan Generated":
+            self.start_prefetch(req, final_result["analysis"])
+
+        known = context.get("_failures", {}).get(normalize_tactic(final_result["tactic"]))
+        if final_result["success"] and known:
+            self.count_avoided(req_type, 1)
+            final_result = dict(final_result, message="Known failure", knownError=known[1] or known[0])
+        return final_result
+
+    def count_avoided(self, req_type, count):
+        """Counts suggestions that would have repeated a recorded failure, each
+        one a Lean check (and repair round trip) not spent on it."""
+        metrics.inc("llm_known_failures_total", count, request_type=req_type)
+        annotate(knownFailures=count)
+        log_message(f"🚫 {count} suggestion(s) already failed on this goal")
+
+    def start_prefetch(self, req, analysis):
+        """Starts the requests `Auto.lean` will send for this plan in the
+        background, so their latency overlaps instead of adding up."""
+        if not self.prefetch_enabled:
+            return
+        step_reqs = plan_requests(req, analysis, int(getenv("LLM_PREFETCH_MAX_STEPS", 4)))
+        if not step_reqs:
+            return
+        if self._prefetch_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=int(getenv("LLM_PREFETCH_WORKERS", 4)), thread_name_prefix="llm-prefetch"
+            )
+        for step_req in step_reqs:
+            self.prefetched.put(prefetch_key(step_req), self._prefetch_executor.submit(self.run_prefetch, step_req))
+        metrics.inc("llm_prefetch_total", len(step_reqs), result="started")
+        log_message(f"🔮 Prefetching {len(step_reqs)} plan step(s)")
+
+    def run_prefetch(self, req):
+        span = start_span(req["requestType"])
+        annotate(prefetch="speculative")
+        try:
+            with self.stage("context"):
+                context = self.prepare_context(req)
+            return self.generate_response(req, context)
+        finally:
+            finish_span(span)
+
+    def claim_prefetch(self, req):
+        """Returns the prefetched response for `req`, waiting for it if it is
+        still running, or None when there is none (or it failed)."""
+        if not self.prefetch_enabled:
+            return None
+        future = self.prefetched.take(prefetch_key(req))
+        if future is None:
+            return None
+        state = "ready" if future.done() else "inflight"
+        with self.stage("prefetch"):
+            try:
+                result = future.result(time_left())
+            except concurrent.futures.TimeoutError:
+                raise DeadlineExceeded("Deadline reached while waiting for a prefetched response") from None
+            except Exception as e:
+                log_message(f"⚠️ Prefetch failed ({e}), generating again", level="WARNING")
+                return None
+        if not result.get("success"):
+            return None
+        metrics.inc("llm_prefetch_total", result=state)
+        annotate(prefetch=state)
+        log_message(f"🔮 Prefetch {state} for [{req.get('requestType')}]")
+        return result
+
+    def search(self, query):
+        result = perform_lean_search(query)
+        if not result["success"]:
+            log_message(f"⚠️ Search for repair failed: {result['message']}", level="WARNING")
+            return "No search results."
+        return result["results"]
+
+    def process_repair(self, req):
+        """Runs diagnose -> search -> fix for `repair_<type>` in one request.
+        The search runs in the background while the fix context is built, and
+        the final response carries the analysis, query and search results."""
+        work_type = req["requestType"].split("_", 1)[1]
+        diagnose_req = dict(req, requestType="diagnose")
+        with self.stage("context"):
+            context = self.prepare_context(diagnose_req)
+        diagnosis = self.generate_response(diagnose_req, context)
+        if not diagnosis["success"]:
+            return diagnosis
+
+        query = diagnosis["searchQuery"] or "NONE"
+        fix_req = dict(req, requestType=f"fix_{work_type}", diagnosisInfo=diagnosis["analysis"])
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-repair")
+        pending = self._executor.submit(self.search, query)
+        with self.stage("context"):
+            context = self.build_context(fix_req)
+        with self.stage("search"):
+            try:
+                search_results = pending.result(time_left())
+            except concurrent.futures.TimeoutError:
+                log_message("⏱️ Search did not finish within the deadline, fixing without it", level="WARNING")
+                search_results = "No search results."
+        fix_req["searchResults"] = search_results
+        context["search_results"] = search_results
+        self.fit_context(context)
+
+        result = self.generate_response(fix_req, context)
+        return dict(result, analysis=diagnosis["analysis"], searchQuery=query, searchResults=search_results)
+
+    def process_candidates(self, req, context, n):
+        req_type = req.get("requestType", "init_next")
+        try:
+            raw_responses = self.receive_llm_candidates(req, context, n)
+        except DeadlineExceeded:
+            raise
+        except LLMError as e:
+            return self.error_response(e)
+        self.record(req, raw_responses)
+
+        with self.stage("parse"):
+            results = [self.report_llm_response(req_type, raw) for raw in raw_responses]
+            tactics = self.rank_candidates([r["tactic"] for r in results if r["success"]])
+        failures = context.get("_failures", {})
+        fresh = [t for t in tactics if normalize_tactic(t) not in failures]
+        if len(fresh) < len(tactics):
+            self.count_avoided(req_type, len(tactics) - len(fresh))
+            if not fresh:
+                known = failures[normalize_tactic(tactics[0])]
+                return dict(results[0], tactic=tactics[0], message="Known failure", knownError=known[1] or known[0])
+            tactics = fresh
+        if not tactics:
+            return results[0]
+
+        log_message(f"🎯 {len(tactics)} distinct candidates from {len(raw_responses)} samples")
+        final_result = dict(results[0], tactic=tactics[0], tactics=tactics, success=True, message="OK")
+        return final_result
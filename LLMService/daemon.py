@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import socket
+import socketserver
+from utils import log_message, getenv
+
+def serve_stdio(handle_line):
+    log_message("🚀 LLM daemon serving on stdio")
+    for line in sys.stdin:
+        if not line.strip(): continue
+        response = handle_line(line)
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8")
+            if not line.strip(): continue
+            response = self.server.handle_line(line)
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, handle_line):
+        self.handle_line = handle_line
+        super().__init__(path, DaemonRequestHandler)
+
+def serve_socket(handle_line, path):
+    if os.path.exists(path):
+        os.unlink(path)
+    with DaemonServer(path, handle_line) as server:
+        log_message(f"🚀 LLM daemon listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+def forward_to_daemon(path, task, req):
+    """Returns the daemon's response, or None when the request could not be
+    delivered (the caller then runs it one-shot). Once it was sent, the daemon
+    may already have acted on it (e.g. recorded a `report_success`), so a lost
+    or garbled reply becomes an error response instead of a second run."""
+    envelope = json.dumps({"task": task, "request": req}) + "\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(float(getenv("LLM_DAEMON_TIMEOUT", 600)))
+        try:
+            sock.connect(path)
+            sock.sendall(envelope.encode("utf-8"))
+        except OSError as e:
+            log_message(f"⚠️ Daemon at {path} unavailable ({e}), running one-shot.", level="WARNING")
+            return None
+        try:
+            reply = sock.makefile("rb").readline()
+            if not reply:
+                raise ValueError("connection closed without a reply")
+            return json.loads(reply)
+        except (OSError, ValueError) as e:
+            log_message(f"⚠️ Daemon at {path} did not answer properly: {e}", level="WARNING")
+            return {
+                "tactic": "",
+                "searchQuery": None,
+                "analysis": None,
+                "results": "",
+                "success": False,
+                "message": f"Daemon did not answer properly: {e}",
+                "errorType": "daemon"
+            }
@@ -0,0 +1,72 @@
+"""Per-request latency budgets.
+
+A request's `deadlineMs` (or `LLM_DEADLINE_MS`) becomes a `Deadline` that
+stays current, via contextvars, for everything the request runs: stages
+check it before starting, the provider call and other waits are bounded by
+`time_left()`, and the time each stage spent is charged to it for the
+request's budget report. `reserve_ms` is kept back for building a degraded
+answer once the budget runs out.
+"""
+import time
+import contextvars
+from errors import DeadlineExceeded
+
+_current_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+class Deadline:
+    def __init__(self, budget_ms, reserve_ms=0.0):
+        self.budget_ms = float(budget_ms)
+        self.reserve = float(reserve_ms) / 1000
+        self.start = time.monotonic()
+        self.end = self.start + self.budget_ms / 1000
+        self.stages = {}
+
+    def usable(self):
+        """Seconds left for work before the reserve."""
+        return self.end - self.reserve - time.monotonic()
+
+    def check(self, stage):
+        if self.usable() <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.budget_ms:.0f} ms reached before {stage}")
+
+    def charge(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self, outcome):
+        spent = time.monotonic() - self.start
+        return {
+            "budgetMs": self.budget_ms,
+            "spentMs": round(spent * 1000, 3),
+            "remainingMs": round(max(0.0, self.budget_ms - spent * 1000), 3),
+            "stages": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            "outcome": outcome,
+        }
+
+def current_deadline():
+    return _current_deadline.get()
+
+def start_deadline(budget_ms, reserve_ms=0.0):
+    """Makes a `Deadline` current for this request; None when there is no budget."""
+    if budget_ms in (None, "", 0, "0"):
+        return None
+    deadline = Deadline(budget_ms, reserve_ms)
+    deadline.token = _current_deadline.set(deadline)
+    return deadline
+
+def finish_deadline(deadline):
+    if deadline is not None:
+        _current_deadline.reset(deadline.token)
+
+def time_left(default=None):
+    """Seconds the current request may still wait (never above `default`), or
+    `default` when it has no deadline."""
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    left = max(0.0, deadline.usable())
+    return left if default is None else min(left, default)
+
+def charge_stage(name, seconds):
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.charge(name, seconds)
@@ -0,0 +1,34 @@
+class LLMError(Exception):
+    """Base class for provider failures; `kind` is reported to Lean as `errorType`."""
+    kind = "llm_error"
+    retryable = False
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class ProviderNotConfigured(LLMError):
+    kind = "not_configured"
+
+class ProviderRequestError(LLMError):
+    kind = "bad_request"
+
+class RateLimitError(LLMError):
+    kind = "rate_limited"
+    retryable = True
+
+class ProviderTimeout(LLMError):
+    kind = "timeout"
+    retryable = True
+
+class ProviderUnavailable(LLMError):
+    kind = "unavailable"
+    retryable = True
+
+class EmptyResponse(LLMError):
+    kind = "empty_response"
+    retryable = True
+
+class DeadlineExceeded(LLMError):
+    kind = "deadline"
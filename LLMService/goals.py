@@ -0,0 +1,193 @@
+import re
+import hashlib
+import struct
+
+IDENT_RE = re.compile(r"(?<![\w'✝.])[^\W\d][\w'✝!?]*")
+BINDER_RE = re.compile(r"(∀|∃!|∃|fun|λ|Π|Σ|∑|∏|⋃|⋂|⨆|⨅)\s+")
+HYP_RE = re.compile(r"^((?:[^\W\d][\w'✝!?]*\s+)*[^\W\d][\w'✝!?]*)\s+:\s+(.*)$")
+
+MINHASH_PERMS = 64
+LSH_BANDS = 16
+_MERSENNE = (1 << 61) - 1
+
+def _rename(text, mapping, start=0):
+    def repl(m):
+        return mapping.get(m.group(0), m.group(0))
+    return text[:start] + IDENT_RE.sub(repl, text[start:])
+
+def _binder_names(segment):
+    names = []
+    rest = segment.lstrip()
+    while rest and rest[0] in "({[⦃":
+        close = {"(": ")", "{": "}", "[": "]", "⦃": "⦄"}[rest[0]]
+        end = rest.find(close)
+        if end == -1:
+            break
+        group = rest[1:end].split(":", 1)[0]
+        names.extend(IDENT_RE.findall(group))
+        rest = rest[end + 1:].lstrip()
+    if not names:
+        for tok in rest.split():
+            if IDENT_RE.fullmatch(tok):
+                names.append(tok)
+            else:
+                break
+    return names
+
+def _rename_binders(line):
+    counter = 0
+    pos = 0
+    while True:
+        m = BINDER_RE.search(line, pos)
+        if not m:
+            return line
+        if m.start() > 0 and (line[m.start() - 1].isalnum() or line[m.start() - 1] == "_"):
+            pos = m.end()
+            continue
+        end = len(line)
+        for stop in (",", "=>", "↦"):
+            idx = line.find(stop, m.end())
+            if idx != -1:
+                end = min(end, idx)
+        mapping = {}
+        for name in _binder_names(line[m.end():end]):
+            if name not in mapping:
+                mapping[name] = f"_b{counter}"
+                counter += 1
+        if mapping:
+            line = _rename(line, mapping, m.end())
+        pos = m.end()
+
+def _split_goal(goal):
+    lines = []
+    for raw in goal.splitlines():
+        if not raw.strip():
+            continue
+        text = " ".join(raw.split())
+        if raw[:1].isspace() and lines and not text.startswith("⊢"):
+            lines[-1] += " " + text
+        else:
+            lines.append(text)
+    hyps, targets = [], []
+    for line in lines:
+        if line.startswith("case "):
+            continue
+        if line.startswith("⊢"):
+            targets.append(line[1:].strip())
+        elif targets:
+            targets[-1] += " " + line
+        else:
+            hyps.append(line)
+    return hyps, targets
+
+def canonicalize_goal(goal, rename_hypotheses=True):
+    """Normalizes a pretty-printed goal so that alpha-equivalent goals compare equal.
+
+    Whitespace is collapsed, `case` tags are dropped, bound variables and
+    hypothesis names are renamed by order of appearance, and hypotheses are
+    sorted wherever their dependencies allow it. With `rename_hypotheses`
+    off, hypothesis names are kept (see `normalize_goal`).
+    """
+    if not goal:
+        return ""
+    hyps, targets = _split_goal(goal)
+
+    entries = []
+    for line in hyps:
+        m = HYP_RE.match(line)
+        if not m:
+            entries.append(([], _rename_binders(line)))
+            continue
+        body = _rename_binders(m.group(2))
+        for name in m.group(1).split():
+            entries.append(([name], body))
+    targets = [_rename_binders(t) for t in targets]
+
+    declared = [names[0] for names, _ in entries if names]
+    mapping = {name: name for name in declared} if not rename_hypotheses else {}
+    for tok in IDENT_RE.findall(" ".join(targets)):
+        if tok in declared and tok not in mapping:
+            mapping[tok] = f"_h{len(mapping)}"
+    remaining = sorted(
+        (e for e in entries if e[0] and e[0][0] not in mapping),
+        key=lambda e: _rename(e[1], {n: "_" for n in declared})
+    )
+    for names, _ in remaining:
+        if names[0] not in mapping:
+            mapping[names[0]] = f"_h{len(mapping)}"
+
+    renamed = []
+    for names, body in entries:
+        new_body = _rename(body, mapping)
+        deps = {mapping[t] for t in IDENT_RE.findall(body) if t in mapping}
+        if names:
+            new_name = mapping[names[0]]
+            deps.discard(new_name)
+            renamed.append((new_name, f"{new_name} : {new_body}", deps))
+        else:
+            renamed.append((None, new_body, deps))
+
+    ordered, placed = [], set()
+    while renamed:
+        ready = [r for r in renamed if r[2] <= placed] or renamed
+        best = min(ready, key=lambda r: r[1])
+        renamed.remove(best)
+        ordered.append(best[1])
+        if best[0]:
+            placed.add(best[0])
+
+    targets = [_rename(t, mapping) for t in targets]
+    return "\n".join(ordered + ["⊢ " + t for t in targets])
+
+def hypothesis_names(goal):
+    """The hypothesis names declared in `goal`, which tactics may refer to."""
+    names = set()
+    for line in _split_goal(goal or "")[0]:
+        m = HYP_RE.match(line)
+        if m:
+            names.update(m.group(1).split())
+    return names
+
+def normalize_goal(goal):
+    """Like `canonicalize_goal` but keeps hypothesis names, which tactics refer
+    to: the form used where a stored tactic is reused verbatim (exact cache
+    hits, known failures)."""
+    return canonicalize_goal(goal, rename_hypotheses=False)
+
+def goal_shingles(canonical_goal, k=3):
+    tokens = re.findall(r"[^\W\d][\w'✝!?.]*|\d+|[^\w\s]", canonical_goal)
+    if len(tokens) < k:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+def _hash_params():
+    params = []
+    for i in range(MINHASH_PERMS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", digest)
+        params.append(((a % (_MERSENNE - 1)) + 1, b % _MERSENNE))
+    return params
+
+_PARAMS = _hash_params()
+
+def minhash_signature(shingles):
+    if not shingles:
+        return None
+    values = [struct.unpack("<Q", hashlib.blake2b(s.encode(), digest_size=8).digest())[0] for s in shingles]
+    return [min((a * v + b) % _MERSENNE for v in values) for a, b in _PARAMS]
+
+def lsh_buckets(signature):
+    rows = MINHASH_PERMS // LSH_BANDS
+    return [
+        (band, hashlib.md5(struct.pack(f"<{rows}Q", *signature[band * rows:(band + 1) * rows])).hexdigest()[:16])
+        for band in range(LSH_BANDS)
+    ]
+
+def signature_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+def pack_signature(signature):
+    return struct.pack(f"<{MINHASH_PERMS}Q", *signature)
+
+def unpack_signature(blob):
+    return list(struct.unpack(f"<{MINHASH_PERMS}Q", blob))
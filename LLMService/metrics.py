@@ -0,0 +1,219 @@
+"""In-process metrics and per-request trace spans.
+
+Counters and latency histograms live in the process-wide `metrics` registry
+and are exported as a snapshot dict or Prometheus text (daemon task
+`metrics`). Each `LLMCore` request opens a `Span` that collects its stage
+timings, cache result, token usage and retries; finished spans are appended
+to `LLM_TRACE_FILE` as JSONL, rotated by size.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from utils import classify_error
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_span = contextvars.ContextVar("llm_span", default=None)
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0}
+            hist["buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            hist["sum"] += seconds
+            hist["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for (name, key), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(key), "count": h["count"], "sum": h["sum"],
+                 "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], h["buckets"]))}
+                for (name, key), h in sorted(self.histograms.items())
+            ]
+        return {"uptime": time.time() - self.started, "counters": counters, "histograms": histograms}
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, key), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, key), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], h["buckets"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class Span:
+    """Everything measured for one request; stays current (via contextvars) for
+    the provider coroutines started while it is open."""
+
+    def __init__(self, request_type):
+        self.id = os.urandom(6).hex()
+        self.request_type = request_type
+        self.start = time.time()
+        self.stages = {}
+        self.tokens = {}
+        self.attrs = {}
+        self.retries = 0
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "ts": self.start,
+            "requestType": self.request_type,
+            "durationMs": round((time.time() - self.start) * 1000, 3),
+            "stages": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            "tokens": self.tokens,
+            "retries": self.retries,
+            "error": self.error,
+            **self.attrs,
+        }
+
+def current_span():
+    return _current_span.get()
+
+def start_span(request_type):
+    span = Span(request_type)
+    span.token = _current_span.set(span)
+    return span
+
+def finish_span(span):
+    _current_span.reset(span.token)
+    duration = time.time() - span.start
+    metrics.inc("llm_requests_total", request_type=span.request_type, outcome="error" if span.error else "ok")
+    metrics.observe("llm_request_seconds", duration, request_type=span.request_type)
+    trace_writer.write(span.to_dict())
+
+def observe_stage(name, seconds):
+    metrics.observe("llm_stage_seconds", seconds, stage=name)
+    span = current_span()
+    if span is not None:
+        span.stages[name] = span.stages.get(name, 0.0) + seconds
+
+def annotate(**attrs):
+    span = current_span()
+    if span is not None:
+        span.attrs.update(attrs)
+
+def record_cache(work_type, hit):
+    metrics.inc("llm_cache_requests_total", work_type=work_type, result="hit" if hit else "miss")
+    annotate(cache="hit" if hit else "miss")
+
+def record_usage(model, usage):
+    """Adds the provider's `usage` (prompt, completion and cached prompt tokens)."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt": getattr(usage, "prompt_tokens", None) or 0,
+        "completion": getattr(usage, "completion_tokens", None) or 0,
+        "cached": getattr(details, "cached_tokens", None) or 0,
+    }
+    span = current_span()
+    for kind, count in counts.items():
+        if count:
+            metrics.inc("llm_tokens_total", count, model=model, kind=kind)
+        if span is not None:
+            span.tokens[kind] = span.tokens.get(kind, 0) + count
+
+def record_retry(kind):
+    metrics.inc("llm_retries_total", kind=kind)
+    span = current_span()
+    if span is not None:
+        span.retries += 1
+
+def record_error(kind, message=None):
+    """Counts a failed request by its error `kind` and by the `classify_error`
+    category of its message."""
+    error_class = classify_error(message or kind)
+    metrics.inc("llm_errors_total", kind=kind, error_class=error_class)
+    span = current_span()
+    if span is not None:
+        span.error = kind
+        span.attrs["errorClass"] = error_class
+
+class TraceWriter:
+    """Appends spans to `LLM_TRACE_FILE` and rotates it at `LLM_TRACE_MAX_BYTES`,
+    keeping `LLM_TRACE_BACKUPS` old files (`trace.jsonl.1`, ...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = None
+
+    def _settings(self):
+        if self._config is None:
+            from utils import getenv
+            self._config = (
+                getenv("LLM_TRACE_FILE"),
+                int(getenv("LLM_TRACE_MAX_BYTES", 10 * 1024 * 1024)),
+                int(getenv("LLM_TRACE_BACKUPS", 3)),
+            )
+        return self._config
+
+    def _rotate(self, path, backups):
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if backups > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def write(self, record):
+        path, max_bytes, backups = self._settings()
+        if not path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if os.path.exists(path) and os.path.getsize(path) + len(line) > max_bytes:
+                    self._rotate(path, backups)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+trace_writer = TraceWriter()
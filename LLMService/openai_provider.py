@@ -0,0 +1,278 @@
+import time
+import random
+import asyncio
+import threading
+import concurrent.futures
+from types import SimpleNamespace
+from email.utils import parsedate_to_datetime
+import openai
+from utils import log_message, getenv
+from budget import estimate_tokens
+from metrics import metrics, record_usage, record_retry
+from deadline import time_left
+from errors import (LLMError, ProviderNotConfigured, ProviderRequestError, RateLimitError,
+                    ProviderTimeout, ProviderUnavailable, EmptyResponse, DeadlineExceeded)
+
+def run_coroutine(coro):
+    """Runs `coro` on the shared provider event loop and blocks until it finishes,
+    or until the request's deadline, at which point the call is cancelled (which
+    closes its connection, so the provider stops generating)."""
+    future = asyncio.run_coroutine_threadsafe(coro, _provider_loop())
+    try:
+        return future.result(time_left())
+    except concurrent.futures.TimeoutError:
+        if future.done():
+            raise
+        future.cancel()
+        raise DeadlineExceeded("LLM call cancelled at the request deadline") from None
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _provider_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-provider-loop", daemon=True).start()
+        return _loop
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to a burst of the same size."""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1.0):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+def parse_retry_after(headers):
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def classify_provider_error(e):
+    if isinstance(e, LLMError):
+        return e
+    if isinstance(e, asyncio.TimeoutError):
+        return ProviderTimeout("LLM request timed out")
+    if isinstance(e, openai.APITimeoutError):
+        return ProviderTimeout(f"LLM request timed out: {e}")
+    if isinstance(e, openai.APIConnectionError):
+        return ProviderUnavailable(f"Could not reach LLM provider: {e}")
+    if isinstance(e, openai.APIStatusError):
+        status = e.status_code
+        retry_after = parse_retry_after(getattr(e.response, "headers", None))
+        if status == 429:
+            return RateLimitError(f"LLM provider rate limit: {e}", status, retry_after)
+        if status >= 500:
+            return ProviderUnavailable(f"LLM provider error {status}: {e}", status, retry_after)
+        return ProviderRequestError(f"LLM request rejected ({status}): {e}", status)
+    return LLMError(f"Error calling LLM: {e}")
+
+class CustomOpenAIProvider:
+    """Async OpenAI-compatible provider.
+
+    All calls run on one background event loop that owns a single keep-alive
+    `AsyncOpenAI` client, so concurrent requests from the daemon share its
+    connection pool, concurrency cap and rate limiters. `generate` is the
+    blocking entry point used by `LLMCore`; `agenerate` is the coroutine.
+    """
+
+    def __init__(self, api_key=None, base_url=None, model=None, max_retries=None):
+        self.api_key = api_key or getenv("LLM_API_KEY")
+        self.base_url = base_url or getenv("LLM_BASE_URL", "https://api.openai.com/v1")
+        self.model_name = model or getenv("LLM_MODEL", "gpt-4o")
+        self.timeout = float(getenv("LLM_TIMEOUT", 120))
+        self.max_retries = int(max_retries if max_retries is not None else getenv("LLM_MAX_RETRIES", 4))
+        self.backoff_base = float(getenv("LLM_BACKOFF_BASE", 1.0))
+        self.backoff_max = float(getenv("LLM_BACKOFF_MAX", 30.0))
+        self.max_concurrency = int(getenv("LLM_MAX_CONCURRENCY", 8))
+        self.stream = str(getenv("LLM_STREAM", "false")).lower() in ("1", "true")
+        self.rpm = getenv("LLM_RPM")
+        self.tpm = getenv("LLM_TPM")
+        self.client = None
+        self._semaphore = None
+        self._request_bucket = None
+        self._token_bucket = None
+
+    def _ensure_client(self):
+        if self.client is not None:
+            return
+        if not self.api_key:
+            raise ProviderNotConfigured("OpenAI client not initialized (Check LLM_API_KEY).")
+        self.client = openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._request_bucket = TokenBucket(float(self.rpm)) if self.rpm else None
+        self._token_bucket = TokenBucket(float(self.tpm)) if self.tpm else None
+
+    def generate(self, system_prompt, user_prompt, stop_when=None, request_type=None, history=None):
+        return run_coroutine(self.agenerate(system_prompt, user_prompt, stop_when=stop_when, history=history))
+
+    def generate_many(self, system_prompt, user_prompt, n, stop_when=None, request_type=None, history=None):
+        return run_coroutine(self.agenerate_many(system_prompt, user_prompt, n, stop_when=stop_when, history=history))
+
+    async def agenerate(self, system_prompt, user_prompt, temperature=0.2, stop_when=None, history=None):
+        choices = await self._agenerate_choices(system_prompt, user_prompt, temperature, 1, stop_when, history)
+        return choices[0]
+
+    async def agenerate_many(self, system_prompt, user_prompt, n, stop_when=None, history=None):
+        """Returns up to `n` completions, either from one call with the API `n` parameter
+        or from `n` concurrent calls with temperatures spread over [0.2, 1.0]."""
+        if getenv("LLM_CANDIDATE_MODE", "parallel") == "n":
+            return await self._agenerate_choices(system_prompt, user_prompt, 0.8, n, history=history)
+
+        temperatures = [0.2 + 0.8 * i / max(1, n - 1) for i in range(n)]
+        results = await asyncio.gather(
+            *(self.agenerate(system_prompt, user_prompt, t, stop_when, history) for t in temperatures),
+            return_exceptions=True
+        )
+        contents = [r for r in results if isinstance(r, str)]
+        if not contents:
+            raise results[0]
+        return contents
+
+    async def _agenerate_choices(self, system_prompt, user_prompt, temperature, n, stop_when=None, history=None):
+        """`history` holds earlier `{"role", "content"}` turns placed between the
+        system prompt and `user_prompt`."""
+        self._ensure_client()
+        log_message(f"🧠 Sending request to LLM ({self.model_name})...")
+        log_message(f"\n\nPrompt: {user_prompt}\n\n", level="DEBUG")
+        messages = [{"role": "system", "content": system_prompt}, *(history or []), {"role": "user", "content": user_prompt}]
+        estimated = sum(estimate_tokens(m["content"]) for m in messages)
+
+        attempt = 0
+        while True:
+            try:
+                start_time = time.time()
+                if stop_when and n == 1 and self.stream:
+                    contents, usage = await self._stream_once(messages, estimated, temperature, stop_when)
+                else:
+                    contents, usage = await self._call_once(messages, estimated, temperature, n)
+                duration = time.time() - start_time
+                cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+                if cached is not None:
+                    log_message(f"✅ LLM responded in {duration:.2f}s ({cached}/{usage.prompt_tokens} prompt tokens cached)")
+                else:
+                    log_message(f"✅ LLM responded in {duration:.2f}s")
+                metrics.observe("llm_provider_seconds", duration, model=self.model_name)
+                record_usage(self.model_name, usage)
+                used = getattr(usage, "total_tokens", None)
+                if self._token_bucket and used is not None:
+                    self._token_bucket.adjust(used - estimated)
+                return contents
+            except Exception as e:
+                error = classify_provider_error(e)
+                if not error.retryable or attempt >= self.max_retries:
+                    log_message(f"❌ LLM Error ({error.kind}): {error}", level="ERROR")
+                    raise error from e
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                delay = random.uniform(0, delay)
+                if error.retry_after is not None:
+                    delay = max(delay, error.retry_after)
+                attempt += 1
+                record_retry(error.kind)
+                log_message(f"⏳ LLM {error.kind}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _acquire_quota(self, estimated):
+        if self._request_bucket:
+            await self._request_bucket.acquire(1)
+        if self._token_bucket:
+            await self._token_bucket.acquire(estimated)
+
+    async def _call_once(self, messages, estimated, temperature, n):
+        await self._acquire_quota(estimated)
+        async with self._semaphore:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature,
+                    **({"n": n} if n > 1 else {})
+                ),
+                timeout=self.timeout + 5
+            )
+        contents = [c.message.content for c in (response.choices or []) if c.message.content]
+        if not contents:
+            raise EmptyResponse("LLM returned an empty response")
+        return contents, getattr(response, "usage", None)
+
+    async def _stream_once(self, messages, estimated, temperature, stop_when):
+        """Streams the completion and stops reading as soon as `stop_when(text)` holds,
+        which closes the connection so the provider stops generating.
+
+        Usage arrives in a final chunk, which an early stop never reads (and
+        some servers do not send); the token counts are then estimated."""
+        await self._acquire_quota(estimated)
+        async with self._semaphore:
+            parts = []
+            usage = None
+
+            async def consume():
+                nonlocal usage
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                try:
+                    async for chunk in stream:
+                        usage = getattr(chunk, "usage", None) or usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        parts.append(delta)
+                        if ("`" in delta or "\n" in delta) and stop_when("".join(parts)):
+                            log_message(f"✂️ Stopped stream early after {len(parts)} chunks")
+                            break
+                finally:
+                    await stream.close()
+
+            await asyncio.wait_for(consume(), timeout=self.timeout + 5)
+        content = "".join(parts)
+        if not content:
+            raise EmptyResponse("LLM returned an empty response")
+        if usage is None:
+            completion = estimate_tokens(content)
+            usage = SimpleNamespace(prompt_tokens=estimated, completion_tokens=completion, total_tokens=estimated + completion)
+        return [content], usage
@@ -0,0 +1,67 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+def goal_target(goal_state):
+    """The `⊢` part of a goal. Chain steps add hypotheses but keep the target,
+    so it is the part of a later step's goal that is known in advance."""
+    goal_state = goal_state or ""
+    index = goal_state.find("⊢")
+    return " ".join(goal_state[index:].split()) if index >= 0 else " ".join(goal_state.split())
+
+def prefetch_key(req):
+    return (req.get("requestType"), req.get("hint"), req.get("pos"), goal_target(req.get("goalState")))
+
+def plan_requests(req, analysis, max_steps):
+    """The requests `Auto.lean` will send for the plan in `analysis`: one
+    `init_type` per CHAIN step, or a single `init_framework` carrying the plan."""
+    try:
+        plan = json.loads(analysis)
+        steps = [str(step) for step in plan["plan"]]
+    except (TypeError, ValueError, KeyError):
+        return []
+    base = dict(req, prevTactic=None, errorMsg=None, searchResults=None, diagnosisInfo=None, candidates=None)
+    if plan.get("type") == "CHAIN":
+        return [dict(base, requestType="init_type", hint=f"[Chain Step]: {step}") for step in steps[:max_steps]]
+
+    plan_str = "\n- ".join(steps)
+    if req.get("hint"):
+        hint = f"[User Hint]: {req['hint']}\n\n[Architect's Plan]:\n- {plan_str}"
+    else:
+        hint = f"[Architect's Plan]:\n- {plan_str}"
+    return [dict(base, requestType="init_framework", hint=hint)]
+
+class PrefetchCache:
+    """Short-lived futures for requests started before they were asked for.
+    Each entry is handed out once; unclaimed ones expire after `ttl` seconds."""
+
+    def __init__(self, ttl=120.0, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, key, future):
+        with self.lock:
+            self._expire()
+            self.entries[key] = (time.monotonic(), future)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                evicted.cancel()
+
+    def take(self, key):
+        with self.lock:
+            self._expire()
+            entry = self.entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self.entries:
+            created, future = next(iter(self.entries.values()))
+            if created >= cutoff:
+                break
+            self.entries.popitem(last=False)
+            future.cancel()
@@ -1,73 +1,116 @@
 import os
 import sys
-import time
+import json
+import string
 import textwrap
 import random
-from openai import OpenAI
+import time
+import threading
 from utils import log_message, getenv
 
+PROMPT_BUNDLE = "prompts.bundle.json"
+BUNDLE_VERSION = 1
+
 class PromptManager:
+    """Renders prompt templates from a compiled bundle.
+
+    Each template is parsed once into literal/placeholder parts and stored,
+    with the source file's mtime, in a single JSON bundle. A changed mtime
+    recompiles just that template, so edits still apply without a restart.
+    """
+
     def __init__(self, prompts_dir="prompts"):
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.prompts_dir = os.path.join(base_dir, prompts_dir)
-        self.templates = {}
-        self._load_templates()
+        self.bundle_path = os.path.join(base_dir, PROMPT_BUNDLE)
+        self.templates = None
+        self.lock = threading.Lock()
 
-    def _load_templates(self):
-        if not os.path.exists(self.prompts_dir):
-            print(f"Warning: Prompts directory {self.prompts_dir} not found", file=sys.stderr)
-            return
-            
-        for filename in os.listdir(self.prompts_dir):
-            if filename.endswith(".txt"):
-                key = filename.split(".")[0]
-                path = os.path.join(self.prompts_dir, filename)
-                try:
-                    with open(path, "r", encoding="utf-8") as f:
-                        self.templates[key] = f.read()
-                except Exception as e:
-                    print(f"Error loading {filename}: {e}", file=sys.stderr)
+    def _load_bundle(self):
+        try:
+            with open(self.bundle_path, "r", encoding="utf-8") as f:
+                bundle = json.load(f)
+            if bundle.get("version") == BUNDLE_VERSION and bundle.get("dir") == self.prompts_dir:
+                return bundle["templates"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def _save_bundle(self):
+        tmp_path = f"{self.bundle_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": BUNDLE_VERSION, "dir": self.prompts_dir, "templates": self.templates}, f)
+            os.replace(tmp_path, self.bundle_path)
+        except OSError as e:
+            print(f"Error saving prompt bundle: {e}", file=sys.stderr)
+
+    def _compile(self, tpl):
+        try:
+            return {"parts": [list(part) for part in string.Formatter().parse(tpl)]}
+        except ValueError as e:
+            return {"error": str(e)}
+
+    def _get_compiled(self, template_name):
+        path = os.path.join(self.prompts_dir, f"{template_name}.txt")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self.lock:
+            if self.templates is None:
+                self.templates = self._load_bundle()
+            entry = self.templates.get(template_name)
+            if entry and entry.get("mtime") == mtime:
+                return entry
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = self._compile(f.read())
+            except Exception as e:
+                print(f"Error loading {template_name}.txt: {e}", file=sys.stderr)
+                return None
+            entry["mtime"] = mtime
+            self.templates[template_name] = entry
+            self._save_bundle()
+            return entry
 
     def render(self, template_name, context):
-        tpl = self.templates.get(template_name, "")
-        if not tpl:
+        entry = self._get_compiled(template_name)
+        if not entry or entry.get("parts") == []:
             return f"Error: Template '{template_name}' missing in {self.prompts_dir}."
-        
+        if "error" in entry:
+            return f"Error rendering {template_name}: {entry['error']}"
+
+        out = []
         try:
-            return tpl.format(**context)
+            for literal, field, spec, conversion in entry["parts"]:
+                out.append(literal)
+                if field is None:
+                    continue
+                value = context[field]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion == "a":
+                    value = ascii(value)
+                out.append(format(value, spec or ""))
         except KeyError as e:
             return f"Error rendering {template_name}: Missing placeholder {e} in data."
         except Exception as e:
             return f"Error rendering {template_name}: {e}"
+        return "".join(out)
 
-class CustomOpenAIProvider:
-    def __init__(self):
-        self.api_key = getenv("LLM_API_KEY")
-        self.base_url = getenv("LLM_BASE_URL", "https://api.openai.com/v1")
-        self.model_name = getenv("LLM_MODEL", "gpt-4o")
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url) if self.api_key else None
-
-    def generate(self, system_prompt, user_prompt):
-        if not self.client: return "OpenAI client not initialized (Check LLM_API_KEY)."
-        try:
-            log_message(f"🧠 Sending request to LLM ({self.model_name})...")
-            log_message(f"\n\nPrompt: {user_prompt}\n\n")
-            start_time = time.time()
-
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2
-            )
-            duration = time.time() - start_time
-            log_message(f"✅ LLM responded in {duration:.2f}s")
-            return response.choices[0].message.content
-        except Exception as e:
-            log_message(f"❌ LLM Error: {e}")
-            return f"Error calling LLM: {e}"
+def create_provider(provider_name):
+    """Builds the configured provider; the OpenAI stack is only imported here."""
+    if provider_name == "mock":
+        return MockLLMProvider()
+    if provider_name == "replay":
+        return ReplayLLMProvider()
+    if provider_name == "router":
+        from router import RoutingProvider
+        return RoutingProvider()
+    from openai_provider import CustomOpenAIProvider
+    return CustomOpenAIProvider()
 
 class MockLLMProvider:
     def __init__(self):
@@ -94,14 +137,47 @@ class MockLLMProvider:
         """)
         self.response_template = getenv("LLM_MOCK_RESPONSE", self.default_template)
 
-    def generate(self, system_prompt, user_prompt):
+    def generate(self, system_prompt, user_prompt, stop_when=None, request_type=None, history=None):
         try:
-            log_message(f"🤖 User prompt: {user_prompt}...\n\n")
+            log_message(f"🤖 User prompt: {user_prompt}...\n\n", level="DEBUG")
             rand_id = str(random.randint(10000000, 99999999))
             response = self.response_template.replace("{random}", rand_id)
-            log_message(f"🤖 [MOCK] Returning fixed response: {response}...")
+            log_message(f"🤖 [MOCK] Returning fixed response: {response}...", level="DEBUG")
         except Exception as e:
-            log_message(f"❌ Mock LLM Error: {e}")
+            log_message(f"❌ Mock LLM Error: {e}", level="ERROR")
             response = self.response_template
             
-        return response
\ No newline at end of file
+        return response
+
+    def generate_many(self, system_prompt, user_prompt, n, stop_when=None, request_type=None, history=None):
+        return [self.generate(system_prompt, user_prompt) for _ in range(n)]
+
+class ReplayLLMProvider:
+    """Returns recorded responses in order instead of calling a model, so a
+    corpus written with `LLM_RECORD_FILE` can be pushed through `LLMCore`
+    deterministically. `load` queues the responses of the next request."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def load(self, responses):
+        with self._lock:
+            self.responses = list(responses or [])
+
+    def _next(self):
+        with self._lock:
+            if not self.responses:
+                return ""
+            return self.responses.pop(0)
+
+    def generate(self, system_prompt, user_prompt, stop_when=None, request_type=None, history=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._next()
+
+    def generate_many(self, system_prompt, user_prompt, n, stop_when=None, request_type=None, history=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._next() for _ in range(n)]
@@ -0,0 +1,138 @@
+"""Client for the shared (L2) tactic cache served by `cache_server.py`.
+
+Lookups are one batched `/mget` with a strict `LLM_L2_TIMEOUT_MS` budget for
+the whole exchange (name resolution, connect and reading the reply); a
+failed or slow server is skipped for `LLM_L2_BACKOFF` seconds so later
+requests do not pay the timeout again. Verified tactics are queued and
+written through with batched `/mput` calls from a background thread.
+"""
+import json
+import time
+import queue
+import atexit
+import threading
+import urllib.request
+import concurrent.futures
+from utils import log_message, getenv
+from metrics import metrics
+from deadline import time_left
+
+class RemoteCache:
+    def __init__(self, url, token=None, timeout=0.15, backoff=30.0, queue_size=1000):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.backoff = backoff
+        self.down_until = 0.0
+        self.queue = queue.Queue(queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def _post(self, path, body, timeout):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(body, ensure_ascii=False).encode("utf-8"), headers=headers, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+
+    def mget(self, keys):
+        """Returns `{key: {"code", "work_type", "goal", "hint"}}` for the keys the
+        shared cache has; `{}` when it is unreachable or over budget."""
+        if time.monotonic() < self.down_until:
+            metrics.inc("llm_l2_cache_total", result="skipped")
+            return {}
+        timeout = time_left(self.timeout)
+        if timeout <= 0:
+            metrics.inc("llm_l2_cache_total", result="skipped")
+            return {}
+        start = time.perf_counter()
+        future = self._post_async("/mget", {"keys": keys}, timeout)
+        try:
+            entries = future.result(timeout).get("entries", {})
+        except Exception as e:
+            if isinstance(e, concurrent.futures.TimeoutError):
+                e = f"no answer within {timeout * 1000:.0f} ms"
+            self.down_until = time.monotonic() + self.backoff
+            metrics.inc("llm_l2_cache_total", result="error")
+            log_message(f"⚠️ Shared cache unavailable ({e}), skipping it for {self.backoff:.0f}s", level="WARNING")
+            return {}
+        metrics.observe("llm_l2_cache_seconds", time.perf_counter() - start)
+        metrics.inc("llm_l2_cache_total", result="hit" if entries else "miss")
+        return entries
+
+    def _post_async(self, path, body, timeout):
+        """Runs `_post` on a daemon thread. urllib's timeout only bounds each
+        socket operation, so a slowly answering server (or a slow name
+        lookup) could hold the caller far longer than `timeout`; waiting on
+        the returned future bounds the whole exchange."""
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(self._post(path, body, timeout))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-l2-lookup", daemon=True).start()
+        return future
+
+    def put(self, entry):
+        """Queues `entry` for the next batched `/mput`; never blocks."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="llm-l2-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            metrics.inc("llm_l2_cache_total", result="dropped")
+
+    def close(self):
+        """Flushes queued writes, waiting at most a couple of seconds."""
+        try:
+            self.queue.put(None, timeout=1)
+        except queue.Full:
+            return
+        self.thread.join(timeout=2)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < 256:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is None
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                try:
+                    self._post("/mput", {"entries": entries}, max(self.timeout, 2.0))
+                    metrics.inc("llm_l2_cache_writes_total", len(entries))
+                except Exception as e:
+                    log_message(f"⚠️ Could not write {len(entries)} entries to the shared cache: {e}", level="WARNING")
+            if done:
+                return
+
+_remote_cache = None
+_remote_cache_lock = threading.Lock()
+
+def get_remote_cache():
+    """The shared cache configured by `LLM_L2_CACHE_URL`, or None."""
+    global _remote_cache
+    url = getenv("LLM_L2_CACHE_URL")
+    if not url:
+        return None
+    with _remote_cache_lock:
+        if _remote_cache is None:
+            _remote_cache = RemoteCache(
+                url,
+                token=getenv("LLM_L2_CACHE_TOKEN"),
+                timeout=float(getenv("LLM_L2_TIMEOUT_MS", 150)) / 1000,
+                backoff=float(getenv("LLM_L2_BACKOFF", 30)),
+            )
+        return _remote_cache
@@ -0,0 +1,222 @@
+"""Latency-aware routing over several OpenAI-compatible backends.
+
+Backends come from `LLM_BACKENDS` (a list in `config.json`, or the same list
+as a JSON string in the environment):
+
+    [{"name": "fast", "base_url": "...", "api_key": "...", "model": "gpt-4o-mini", "tier": "fast"},
+     {"name": "strong", "base_url": "...", "api_key": "...", "model": "gpt-4o", "tier": "strong"}]
+
+`fix_*` requests (issued after a failed attempt) go to the `strong` tier,
+everything else to `fast`. Within a tier, backends are tried fastest first;
+when the first one is still running at its own p95, the same request is
+hedged on the next backend and whichever answers first wins. Backends that
+keep failing are skipped until their circuit breaker cools down.
+"""
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from utils import log_message, getenv
+from errors import LLMError, ProviderNotConfigured, ProviderUnavailable
+from metrics import metrics
+from openai_provider import CustomOpenAIProvider, run_coroutine
+
+STRONG_PREFIXES = ("fix_",)
+
+class BackendStats:
+    """Rolling latency window (and its moving average), error rate and circuit
+    breaker of one backend."""
+
+    def __init__(self, window, failure_threshold, cooldown):
+        self.latencies = deque(maxlen=window)
+        self.ewma = None
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def percentile(self, q):
+        with self.lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self):
+        with self.lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def available(self):
+        """Closed, or open long enough that one trial request (half-open) may go
+        through. Has no side effects, so ranking backends does not use up the trial."""
+        with self.lock:
+            return self.opened_at is None or time.monotonic() - self.opened_at >= self.cooldown
+
+    def acquire(self):
+        """Like `available`, but claims the half-open trial for the caller, so
+        concurrent requests do not all retry an open backend at once."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def _smooth(self, seconds):
+        self.ewma = seconds if self.ewma is None else 0.7 * self.ewma + 0.3 * seconds
+
+    def record_success(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self._smooth(seconds)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_cancelled(self, seconds):
+        """Counts an attempt that lost a hedge race: its elapsed time is a lower
+        bound, so it moves the ranking but not the p95 used for hedging."""
+        with self.lock:
+            self._smooth(seconds)
+
+    def record_failure(self):
+        with self.lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class Backend:
+    def __init__(self, spec, stats_args):
+        self.name = spec.get("name") or spec.get("model")
+        self.tier = spec.get("tier", "fast")
+        self.provider = CustomOpenAIProvider(
+            api_key=spec.get("api_key") or getenv(spec.get("api_key_env", "LLM_API_KEY")),
+            base_url=spec.get("base_url"),
+            model=spec.get("model"),
+            max_retries=spec.get("max_retries", 1)
+        )
+        self.stats = BackendStats(*stats_args)
+
+    def expected_latency(self):
+        ewma = self.stats.ewma
+        return 0.0 if ewma is None else ewma * (1 + 4 * self.stats.error_rate)
+
+class RoutingProvider:
+    def __init__(self):
+        specs = getenv("LLM_BACKENDS") or []
+        if isinstance(specs, str):
+            specs = json.loads(specs)
+        if not specs:
+            raise ProviderNotConfigured("LLM_PROVIDER=router needs LLM_BACKENDS.")
+        stats_args = (
+            int(getenv("LLM_ROUTE_WINDOW", 50)),
+            int(getenv("LLM_BREAKER_FAILURES", 3)),
+            float(getenv("LLM_BREAKER_COOLDOWN", 30)),
+        )
+        self.backends = [Backend(spec, stats_args) for spec in specs]
+        self.min_samples = int(getenv("LLM_HEDGE_MIN_SAMPLES", 10))
+        self.hedge = str(getenv("LLM_HEDGE", "true")).lower() in ("1", "true")
+
+    def tier_for(self, request_type):
+        return "strong" if (request_type or "").startswith(STRONG_PREFIXES) else "fast"
+
+    def candidates(self, request_type):
+        """Available backends, the request's tier first, each group fastest first.
+        Backends without samples sort first so they get measured; the other tier
+        stays reachable as a fallback when this one is down."""
+        tier = self.tier_for(request_type)
+        ranked = sorted(
+            self.backends,
+            key=lambda b: (b.tier != tier, b.expected_latency(), self.backends.index(b))
+        )
+        return [b for b in ranked if b.stats.available()]
+
+    def hedge_delay(self, backend):
+        if not self.hedge or len(backend.stats.latencies) < self.min_samples:
+            return None
+        return backend.stats.percentile(0.95)
+
+    async def _attempt(self, backend, call):
+        if not backend.stats.acquire():
+            raise ProviderUnavailable(f"Backend {backend.name} is unavailable (circuit open).")
+        start = time.monotonic()
+        try:
+            result = await call(backend.provider)
+        except asyncio.CancelledError:
+            backend.stats.record_cancelled(time.monotonic() - start)
+            raise
+        except LLMError:
+            backend.stats.record_failure()
+            metrics.inc("llm_route_total", backend=backend.name, outcome="error")
+            raise
+        backend.stats.record_success(time.monotonic() - start)
+        metrics.inc("llm_route_total", backend=backend.name, outcome="ok")
+        return result
+
+    async def _route(self, request_type, call, hedged):
+        backends = self.candidates(request_type)
+        if not backends:
+            raise ProviderUnavailable("All LLM backends are unavailable (circuit open).")
+
+        error = None
+        queue = list(backends)
+        while queue:
+            primary = queue.pop(0)
+            task = asyncio.ensure_future(self._attempt(primary, call))
+            delay = self.hedge_delay(primary) if hedged and queue else None
+            if delay is not None:
+                # Unlike awaiting the task, `asyncio.wait` does not pass a
+                # cancellation (e.g. the request deadline) on to it.
+                try:
+                    done, _ = await asyncio.wait({task}, timeout=delay)
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                if not done:
+                    backup = queue.pop(0)
+                    log_message(f"🔀 {primary.name} slower than p95 ({delay:.1f}s), hedging on {backup.name}")
+                    metrics.inc("llm_hedges_total", backend=backup.name)
+                    result, error = await self._race(task, asyncio.ensure_future(self._attempt(backup, call)))
+                    if result is not None:
+                        return result
+                    continue
+            try:
+                return await task
+            except LLMError as e:
+                error = e
+                log_message(f"⚠️ Backend {primary.name} failed ({e.kind}), trying next", level="WARNING")
+        raise error
+
+    async def _race(self, *tasks):
+        """Returns `(result, None)` from the first task to succeed, cancelling the
+        rest, or `(None, last_error)` when all of them fail. Cancelling the race
+        cancels every task still running."""
+        pending, error = set(tasks), None
+        while pending:
+            try:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                for task in pending:
+                    task.cancel()
+                raise
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return task.result(), None
+                error = task.exception()
+        return None, error
+
+    def generate(self, system_prompt, user_prompt, stop_when=None, request_type=None, history=None):
+        call = lambda provider: provider.agenerate(system_prompt, user_prompt, stop_when=stop_when, history=history)
+        return run_coroutine(self._route(request_type, call, hedged=True))
+
+    def generate_many(self, system_prompt, user_prompt, n, stop_when=None, request_type=None, history=None):
+        call = lambda provider: provider.agenerate_many(system_prompt, user_prompt, n, stop_when=stop_when, history=history)
+        return run_coroutine(self._route(request_type, call, hedged=False))
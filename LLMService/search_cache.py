@@ -0,0 +1,195 @@
+"""Memoizes offline theorem-search results.
+
+Queries are keyed on their canonical form: the sorted, deduplicated,
+lower-cased tokens `search_index.tokenize` produces, which is exactly what
+the BM25 search scores, so reordered or repeated keywords share an entry.
+Results live in a bounded in-memory LRU and in a `search_cache` table of the
+cache database that expires after `LLM_SEARCH_CACHE_TTL` seconds. A rebuilt
+index (new `meta.json` mtime) starts from fresh keys. Hit counts are kept in
+memory and written in batches, so a hit never waits on the database.
+
+    python search_cache.py stats
+    python search_cache.py clear
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import atexit
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+from utils import log_message, getenv
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_cache_created ON search_cache (created);
+"""
+
+FLUSH_HITS = 64
+FLUSH_SECONDS = 30
+
+def canonical_query(query):
+    from search_index import tokenize
+    return " ".join(sorted(set(tokenize(query))))
+
+class SearchCache:
+    def __init__(self, db_path=None, max_entries=None, ttl=None):
+        from cache import SQLiteStore, CACHE_DB
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.db_path = db_path or getenv("LLM_CACHE_DB") or os.path.join(base_dir, CACHE_DB)
+        self.store = SQLiteStore(self.db_path, SCHEMA)
+        self.max_entries = int(max_entries if max_entries is not None else getenv("LLM_SEARCH_CACHE_SIZE", 256))
+        self.ttl = float(ttl if ttl is not None else getenv("LLM_SEARCH_CACHE_TTL", 24 * 3600))
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending_hits = {}
+        self.pending_count = 0
+        self.last_flush = time.monotonic()
+        atexit.register(self.flush_hits)
+
+    def key(self, index_path, query, top_k):
+        try:
+            version = os.stat(os.path.join(index_path, "meta.json")).st_mtime_ns
+        except OSError:
+            version = 0
+        raw_key = f"{os.path.abspath(index_path)}||{version}||{top_k}||{canonical_query(query)}"
+        return hashlib.md5(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached result lines for `key`, or None."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[0] >= time.time() - self.ttl:
+                self.memory.move_to_end(key)
+        if entry is not None and entry[0] >= time.time() - self.ttl:
+            self._record_hit(key, "memory", entry[2])
+            return entry[1]
+
+        try:
+            row = self.store.execute(
+                "SELECT results, seconds, created FROM search_cache WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Search cache lookup failed: {e}", level="WARNING")
+            row = None
+        if row is None:
+            metrics.inc("llm_search_cache_total", result="miss")
+            return None
+        results, seconds, created = json.loads(row[0]), row[1], row[2]
+        self._remember(key, (created, results, seconds))
+        self._record_hit(key, "disk", seconds)
+        return results
+
+    def put(self, key, query, results, seconds):
+        now = time.time()
+        self._remember(key, (now, results, seconds))
+        try:
+            self.store.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, results, seconds, hits, created) VALUES (?, ?, ?, ?, 0, ?)",
+                (key, query, json.dumps(results, ensure_ascii=False), seconds, now)
+            )
+            self.store.execute("DELETE FROM search_cache WHERE created < ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            log_message(f"⚠️ Failed to save search results: {e}", level="WARNING")
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def _record_hit(self, key, tier, seconds):
+        """Counts the hit and the backend time it saved, in the process metrics
+        and, batched by `flush_hits` (also at exit, so one-shot processes add
+        up too), in the entry's row."""
+        metrics.inc("llm_search_cache_total", result=tier)
+        metrics.inc("llm_search_saved_seconds_total", seconds)
+        with self.lock:
+            self.pending_hits[key] = self.pending_hits.get(key, 0) + 1
+            self.pending_count += 1
+            due = self.pending_count >= FLUSH_HITS or time.monotonic() - self.last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush_hits()
+        log_message(f"⚡ Search cache hit ({tier}, saved {seconds * 1000:.1f} ms)")
+
+    def flush_hits(self):
+        """Adds the hit counts gathered since the last flush to their rows, in
+        one transaction."""
+        with self.lock:
+            pending = self.pending_hits
+            self.pending_hits, self.pending_count = {}, 0
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        conn = self.store.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE search_cache SET hits = hits + ? WHERE key = ?", [(n, key) for key, n in pending.items()]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            log_message(f"⚠️ Failed to save search cache hit counts: {e}", level="WARNING")
+
+    def stats(self):
+        self.flush_hits()
+        row = self.store.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * seconds), 0), COALESCE(SUM(seconds), 0) "
+            "FROM search_cache WHERE created >= ?", (time.time() - self.ttl,)
+        ).fetchone()
+        entries, hits, saved, spent = row
+        lookups = entries + hits
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": entries,
+            "hitRate": hits / lookups if lookups else 0.0,
+            "searchSeconds": spent,
+            "savedSeconds": saved,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.pending_hits, self.pending_count = {}, 0
+        self.store.execute("DELETE FROM search_cache")
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache():
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the theorem-search result cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+    cache = get_search_cache()
+    if args.command == "stats":
+        json.dump(cache.stats(), sys.stdout, indent=2)
+        print()
+    else:
+        cache.clear()
+        print("Search cache cleared.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Offline theorem search: a BM25 inverted index over a Lean declaration dump.
+
+The dump is JSONL with one `{"name", "type", "doc"}` object per line (see
+`#llm_export_decls` in `LLMTools/Search.lean`). `build` writes flat binary
+arrays that `SearchIndex` memory-maps, so opening an index costs a few page
+faults and a query only touches the postings of its own terms.
+
+    python search_index.py build decls.jsonl search-index/
+    python search_index.py query search-index/ "add comm nat"
+"""
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import heapq
+import array
+import shutil
+import tempfile
+import threading
+import argparse
+from bisect import bisect_left
+
+INDEX_VERSION = 1
+K1 = 1.2
+B = 0.75
+NAME_BOOST = 3
+DOC_BOOST = 1
+MAX_POSTINGS = 5000
+
+WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+|[^\W\d_a-zA-Z]+")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def tokenize(text):
+    """Lower-cased identifier sub-tokens: `Nat.succ_le_iff` -> nat, succ, le, iff;
+    `LinearOrderedField` -> linear, ordered, field."""
+    tokens = []
+    for word in WORD_RE.findall(text or ""):
+        parts = CAMEL_RE.findall(word) or [word]
+        tokens.extend(p.lower() for p in parts)
+        if len(parts) > 1:
+            tokens.append(word.lower())
+    return tokens
+
+def document_terms(decl):
+    name = decl.get("name", "")
+    terms = {}
+    for tokens, boost in (
+        (tokenize(name), NAME_BOOST),
+        (tokenize(decl.get("type", "")), 1),
+        (tokenize(decl.get("doc") or ""), DOC_BOOST),
+    ):
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + boost
+    return terms
+
+def _write_array(path, typecode, values):
+    with open(path, "wb") as f:
+        array.array(typecode, values).tofile(f)
+
+def build_index(dump_path, out_dir):
+    """Builds the index for the JSONL dump at `dump_path` and publishes it at `out_dir`.
+
+    `out_dir` is a symlink to a versioned sibling directory (`.<name>.index-*`).
+    A rebuild writes a new version and then swaps the symlink atomically with
+    `os.replace`, so readers always find a complete index. A service that has
+    the previous version mapped keeps reading it intact and reopens the index
+    when `meta.json` changes. The previous version is kept until the next
+    rebuild, and older ones are removed.
+    """
+    out_dir = os.path.abspath(out_dir)
+    parent, name = os.path.split(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    version_dir = tempfile.mkdtemp(prefix=f".{name}.index-", dir=parent)
+    try:
+        counts = _write_index(dump_path, version_dir)
+        os.chmod(version_dir, 0o755)
+        previous = os.path.realpath(out_dir) if os.path.islink(out_dir) else None
+        _publish(out_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    keep = {version_dir, previous}
+    for entry in os.scandir(parent):
+        if entry.name.startswith(f".{name}.index-") and entry.is_dir(follow_symlinks=False) and entry.path not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return counts
+
+def _publish(out_dir, version_dir):
+    """Points `out_dir` at `version_dir`."""
+    parent, name = os.path.split(out_dir)
+    target = os.path.basename(version_dir)
+    if os.path.islink(out_dir) or not os.path.exists(out_dir):
+        link = os.path.join(parent, f".{name}.link-{os.getpid()}")
+        os.symlink(target, link)
+        os.replace(link, out_dir)
+        return
+    # A plain directory from an older build: move it aside once and put the
+    # symlink in its place, restoring the directory if that fails.
+    old_dir = os.path.join(parent, f".{name}.old-{os.getpid()}")
+    os.replace(out_dir, old_dir)
+    try:
+        os.symlink(target, out_dir)
+    except BaseException:
+        os.replace(old_dir, out_dir)
+        raise
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def _write_index(dump_path, out_dir):
+    """Each term's postings are stored impact-ordered (highest BM25 term weight
+    first), so queries can stop early on very frequent terms."""
+    postings = {}
+    doc_lengths = []
+    doc_offsets = [0]
+
+    with open(dump_path, "r", encoding="utf-8") as src, \
+         open(os.path.join(out_dir, "docs.txt"), "wb") as docs:
+        for line in src:
+            if not line.strip():
+                continue
+            decl = json.loads(line)
+            if not decl.get("name"):
+                continue
+            doc_id = len(doc_lengths)
+            terms = document_terms(decl)
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+            doc_lengths.append(sum(terms.values()))
+
+            text = f"{decl['name']} : {' '.join(decl.get('type', '').split())}".encode("utf-8")
+            docs.write(text)
+            doc_offsets.append(doc_offsets[-1] + len(text))
+
+    n_docs = len(doc_lengths)
+    avgdl = sum(doc_lengths) / n_docs if n_docs else 0.0
+    vocab = sorted(postings)
+    term_offsets, post_starts, ids, weights = [0], [0], array.array("I"), array.array("f")
+    with open(os.path.join(out_dir, "vocab.txt"), "wb") as f:
+        for term in vocab:
+            encoded = term.encode("utf-8")
+            f.write(encoded)
+            term_offsets.append(term_offsets[-1] + len(encoded))
+            impacts = [
+                (tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc_lengths[doc_id] / avgdl)), doc_id)
+                for doc_id, tf in postings[term]
+            ]
+            impacts.sort(key=lambda item: (-item[0], item[1]))
+            for weight, doc_id in impacts:
+                ids.append(doc_id)
+                weights.append(weight)
+            post_starts.append(len(ids))
+
+    _write_array(os.path.join(out_dir, "vocab.idx"), "Q", term_offsets)
+    _write_array(os.path.join(out_dir, "vocab.post"), "Q", post_starts)
+    _write_array(os.path.join(out_dir, "docs.idx"), "Q", doc_offsets)
+    with open(os.path.join(out_dir, "post.ids"), "wb") as f:
+        ids.tofile(f)
+    with open(os.path.join(out_dir, "post.w"), "wb") as f:
+        weights.tofile(f)
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_VERSION, "docs": n_docs, "terms": len(vocab),
+            "avgdl": avgdl, "byteorder": sys.byteorder
+        }, f)
+    return n_docs, len(vocab)
+
+class _Terms:
+    """Sequence view over the sorted vocabulary, for `bisect` on the mmap."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+class SearchIndex:
+    def __init__(self, path):
+        # Open every file from one version even if a rebuild swaps the symlink meanwhile.
+        self.source = path
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION or self.meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Search index at {path} is incompatible, please rebuild it")
+        self.path = path
+        self.n_docs = self.meta["docs"]
+        self._files = []
+        self._maps = []
+        self._views = []
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+        self._closed = False
+        self.terms = _Terms(self._map("vocab.txt"), self._map("vocab.idx", "Q"))
+        self.post_starts = self._map("vocab.post", "Q")
+        self.post_ids = self._map("post.ids", "I")
+        self.post_weights = self._map("post.w", "f")
+        self.docs = self._map("docs.txt")
+        self.doc_offsets = self._map("docs.idx", "Q")
+
+    def _map(self, name, typecode=None):
+        f = open(os.path.join(self.path, name), "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            view = memoryview(b"")
+        else:
+            self._maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            view = memoryview(self._maps[-1])
+        self._views.append(view)
+        if typecode:
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def retire(self):
+        """Closes the index once no search is using it any more."""
+        with self._lock:
+            self._retired = True
+            if self._users == 0:
+                self._close()
+
+    def _close(self):
+        self._closed = True
+        for view in reversed(self._views):
+            view.release()
+        for m in self._maps:
+            m.close()
+        for f in self._files:
+            f.close()
+
+    def _lookup(self, term):
+        key = term.encode("utf-8")
+        i = bisect_left(self.terms, key)
+        if i < len(self.terms) and self.terms[i] == key:
+            return self.post_starts[i], self.post_starts[i + 1]
+        return None
+
+    def document(self, doc_id):
+        return bytes(self.docs[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]]).decode("utf-8")
+
+    def search(self, query, top_k=20, max_postings=MAX_POSTINGS):
+        """Returns `(score, "name : type")` pairs for the best BM25 matches.
+
+        At most `max_postings` of a term's impact-ordered postings are scored;
+        past that point a single term adds little to any document's rank.
+        """
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._users += 1
+        if closed:
+            return get_search_index(self.source).search(query, top_k, max_postings)
+        try:
+            return self._search(query, top_k, max_postings)
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._retired and self._users == 0:
+                    self._close()
+
+    def _search(self, query, top_k, max_postings):
+        scores = {}
+        for term in set(tokenize(query)):
+            span = self._lookup(term)
+            if span is None:
+                continue
+            start, end = span
+            df = end - start
+            idf = max(0.0, math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)))
+            ids = self.post_ids[start:min(end, start + max_postings)]
+            weights = self.post_weights[start:min(end, start + max_postings)]
+            for doc_id, weight in zip(ids, weights):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * weight
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.document(doc_id)) for doc_id, score in best]
+
+def get_search_index(path):
+    """The open index at `path`, reopened when a rebuild has replaced it (a new
+    `meta.json`); the replaced one is closed once its searches finish."""
+    path = os.path.abspath(path)
+    meta = os.stat(os.path.join(path, "meta.json"))
+    version = (meta.st_ino, meta.st_mtime_ns)
+    with _indexes_lock:
+        entry = _indexes.get(path)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                entry[1].retire()
+            entry = _indexes[path] = (version, SearchIndex(path))
+        return entry[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline theorem search index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build an index from a JSONL declaration dump")
+    build.add_argument("dump")
+    build.add_argument("out")
+    query = sub.add_parser("query", help="Run a query against a built index")
+    query.add_argument("index")
+    query.add_argument("query")
+    query.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        n_docs, n_terms = build_index(args.dump, args.out)
+        print(f"Indexed {n_docs} declarations, {n_terms} terms into {args.out}")
+    else:
+        for score, text in get_search_index(args.index).search(args.query, args.top):
+            print(f"{score:7.3f}  {text}")
+
+if __name__ == "__main__":
+    main()
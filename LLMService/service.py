@@ -1,13 +1,67 @@
+import os
 import sys
 import json
 import argparse
-from core import LLMCore
-from utils import perform_lean_search
+from utils import perform_lean_search, log_message, getenv
+
+def handle_task(core, task, req):
+    if task == "search":
+        return perform_lean_search(req.get("query", ""))
+    elif task == "llm":
+        return core.process_full_request(req)
+    elif task == "metrics":
+        from metrics import metrics
+        return {"success": True, "metrics": metrics.snapshot(), "prometheus": metrics.prometheus(), "message": "OK"}
+    return {"success": False, "message": f"Unknown task: {task}"}
+
+def handle_line(core, line):
+    try:
+        envelope = json.loads(line)
+    except Exception as e:
+        return {"success": False, "message": f"Input JSON error: {e}"}
+
+    task = envelope.get("task", "llm")
+    req = envelope.get("request", {})
+    try:
+        response = handle_task(core, task, req)
+    except Exception as e:
+        log_message(f"❌ Daemon request failed: {e}", level="ERROR")
+        response = {"success": False, "message": f"Service error: {e}"}
+
+    if "id" in envelope:
+        response = dict(response, id=envelope["id"])
+    return response
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--task", type=str, default="llm", help="Task: 'llm' or 'search'")
+    parser.add_argument("--task", type=str, default="llm", help="Task: 'llm', 'search', 'metrics' or 'batch'")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived daemon speaking newline-delimited JSON")
+    parser.add_argument("--socket", type=str, default=None, help="Serve on (or forward to) this Unix socket instead of stdio")
+    parser.add_argument("--input", type=str, default=None, help="Batch: JSONL file of requests")
+    parser.add_argument("--output", type=str, default=None, help="Batch: JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=4, help="Batch: number of concurrent requests")
     args = parser.parse_args()
+
+    if args.task == "batch":
+        if not args.input or not args.output:
+            print(json.dumps({"success": False, "message": "Batch needs --input and --output"}))
+            return
+        from core import LLMCore
+        from batch import run_batch
+        core = LLMCore()
+        print(json.dumps(run_batch(lambda task, req: handle_task(core, task, req), args.input, args.output, args.workers)))
+        return
+
+    if args.serve:
+        from core import LLMCore
+        from daemon import serve_socket, serve_stdio
+        core = LLMCore()
+        if args.socket:
+            serve_socket(lambda line: handle_line(core, line), args.socket)
+        else:
+            serve_stdio(lambda line: handle_line(core, line))
+        return
+
     try:
         input_data = sys.stdin.read()
         if not input_data: return
@@ -16,15 +70,24 @@ def main():
         print(json.dumps({"success": False, "message": f"Input JSON error: {e}"}))
         return
 
-    if args.task == "search":
-        result = perform_lean_search(req.get("query", ""))
-        print(json.dumps(result))
-    elif args.task == "llm":
-        core = LLMCore()
-        response = core.process_full_request(req)
-        print(json.dumps(response))
+    socket_path = args.socket or getenv("LLM_DAEMON_SOCKET")
+    if socket_path and os.name == "posix":
+        from daemon import forward_to_daemon
+        response = forward_to_daemon(socket_path, args.task, req)
+        if response is not None:
+            print(json.dumps(response))
+            return
+
+    if args.task in ("search", "llm", "metrics"):
+        if args.task == "llm":
+            from core import LLMCore
+            # A one-shot process exits after this request, so nothing could claim a prefetch.
+            core = LLMCore(prefetch=False)
+        else:
+            core = None
+        print(json.dumps(handle_task(core, args.task, req)))
     else:
         print(json.dumps({"success": False, "message": f"Unknown task: {args.task}"}))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,47 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from budget import estimate_tokens
+
+class PromptSession:
+    """Append-only conversation for one theorem. Turns are never rewritten, so
+    every request in the session extends the previous request's prefix."""
+
+    def __init__(self, max_tokens):
+        self.max_tokens = max_tokens
+        self.turns = []
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def history(self):
+        with self.lock:
+            return list(self.turns)
+
+    def append(self, user_prompt, response):
+        added = estimate_tokens(user_prompt) + estimate_tokens(response)
+        with self.lock:
+            if self.tokens + added > self.max_tokens:
+                self.turns, self.tokens = [], 0
+            self.turns += [{"role": "user", "content": user_prompt}, {"role": "assistant", "content": response}]
+            self.tokens += added
+
+class SessionStore:
+    """LRU of `PromptSession`s keyed by theorem statement."""
+
+    def __init__(self, max_sessions=64, max_tokens=12000):
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, thm_decl):
+        key = hashlib.md5(thm_decl.encode("utf-8")).hexdigest()
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.sessions[key] = PromptSession(self.max_tokens)
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(key)
+            return session
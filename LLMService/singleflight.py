@@ -0,0 +1,207 @@
+"""Coalesces identical concurrent provider calls.
+
+Within a process, callers with the same key wait for the first one's call.
+Across processes (POSIX only), the leader holds an exclusive `flock` on
+`<key>.lock` in `LLM_SINGLEFLIGHT_DIR` for the duration of the call. Other
+processes register in `<key>.<inode>.wait` (one line each) and wait for the
+lock. If anyone registered, the leader publishes its result to
+`<key>.<inode>.json`. It then unlinks the lock file while still holding it.
+The followers read the result one at a time under the old lock, and the last
+of them removes both files, so a finished flight leaves nothing behind.
+Files of abandoned flights are swept by age.
+"""
+import os
+import json
+import time
+import threading
+from utils import log_message
+from deadline import time_left
+from errors import DeadlineExceeded
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POLL_INTERVAL = 0.05
+SWEEP_INTERVAL = 600
+STALE_SECONDS = 3600
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, directory=None, wait=300.0):
+        self.directory = directory if fcntl else None
+        self.wait = wait
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.last_sweep = float("-inf")
+
+    def do(self, key, fn):
+        """Returns `(value, shared)`: `fn()`'s value, or the value of an identical
+        call already in flight, in which case `shared` names where it came from
+        (`"process"` or `"shared"`)."""
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = _Call()
+            if leader:
+                break
+            if not call.event.wait(time_left()):
+                raise DeadlineExceeded("Deadline reached while waiting for an identical request")
+            # The leader ran out of its own budget, which says nothing about
+            # ours: try again, as the new leader or behind one.
+            if isinstance(call.error, DeadlineExceeded):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.value, "process"
+
+        shared = None
+        try:
+            call.value, shared = self._do_shared(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.value, shared
+
+    def _do_shared(self, key, fn):
+        if not self.directory:
+            return fn(), None
+        base = os.path.join(self.directory, key)
+        while True:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                lock_file = open(base + ".lock", "a")
+            except OSError as e:
+                log_message(f"⚠️ Single-flight lock unavailable: {e}", level="WARNING")
+                return fn(), None
+
+            with lock_file:
+                flight = f"{base}.{os.fstat(lock_file.fileno()).st_ino}"
+                if self._try_lock(lock_file):
+                    # A finished flight unlinks its lock; if we opened that one, start over.
+                    if self._is_current(lock_file, base + ".lock"):
+                        return self._lead(base, flight, fn), None
+                    continue
+
+                self._append(flight + ".wait")
+                if not self._wait_lock(lock_file):
+                    if time_left(self.wait) <= 0:
+                        raise DeadlineExceeded("Deadline reached while waiting for an identical request")
+                    return fn(), None
+                found, value = self._take_result(flight)
+                if found:
+                    return value, "shared"
+                # The leader failed or finished before we registered: run it ourselves.
+
+    def _lead(self, base, flight, fn):
+        self._sweep()
+        try:
+            value = fn()
+            if os.path.exists(flight + ".wait"):
+                self._write_result(flight + ".json", {"value": value, "read": 0})
+            return value
+        finally:
+            self._remove(base + ".lock")
+
+    def _take_result(self, flight):
+        """Reads the published result while holding the flight's lock, removing
+        the flight's files once every registered follower has read it."""
+        try:
+            with open(flight + ".json", "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self._remove(flight + ".wait")
+            return False, None
+        result["read"] += 1
+        if result["read"] >= self._count(flight + ".wait"):
+            self._remove(flight + ".json")
+            self._remove(flight + ".wait")
+        else:
+            self._write_result(flight + ".json", result)
+        return True, result["value"]
+
+    def _try_lock(self, lock_file):
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _is_current(self, lock_file, path):
+        try:
+            return os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def _wait_lock(self, lock_file):
+        deadline = time.monotonic() + time_left(self.wait)
+        while time.monotonic() < deadline:
+            if self._try_lock(lock_file):
+                return True
+            time.sleep(POLL_INTERVAL)
+        log_message("⚠️ Gave up waiting for an identical request in another process", level="WARNING")
+        return False
+
+    def _write_result(self, path, value):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log_message(f"⚠️ Could not publish single-flight result: {e}", level="WARNING")
+            self._remove(tmp_path)
+
+    def _append(self, path):
+        try:
+            with open(path, "a") as f:
+                f.write("+\n")
+        except OSError:
+            pass
+
+    def _count(self, path):
+        try:
+            with open(path, "r") as f:
+                return sum(1 for _ in f)
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _sweep(self):
+        """At most every `SWEEP_INTERVAL` seconds, deletes files left by
+        abandoned flights. A lock file is only removed while we hold it."""
+        now = time.monotonic()
+        if now - self.last_sweep < SWEEP_INTERVAL:
+            return
+        self.last_sweep = now
+        cutoff = time.time() - STALE_SECONDS
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.stat().st_mtime < cutoff]
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith(".lock"):
+                self._remove(entry.path)
+                continue
+            try:
+                with open(entry.path, "a") as lock_file:
+                    if self._try_lock(lock_file) and self._is_current(lock_file, entry.path):
+                        self._remove(entry.path)
+            except OSError:
+                pass
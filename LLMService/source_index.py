@@ -0,0 +1,202 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+DECL_KEYWORDS = ("theorem", "lemma", "def", "instance", "example", "structure", "class")
+TOKEN_RE = re.compile(r"(?<!\w)(" + "|".join(DECL_KEYWORDS) + r")(?!\w)|--|\n")
+
+INDEX_CACHE_SIZE = 8
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+def _scan(source, start, end):
+    """Single pass over `source[start:end]`, which must begin at a line start.
+
+    Returns the declaration keywords that are not preceded by `--` on their
+    line, as parallel (starts, ends, keywords) lists, plus the line starts
+    found inside the range.
+    """
+    starts, ends, keywords, line_starts = [], [], [], []
+    commented = False
+    for m in TOKEN_RE.finditer(source, start, end):
+        kw = m.group(1)
+        if kw:
+            if not commented:
+                starts.append(m.start())
+                ends.append(m.end())
+                keywords.append(kw)
+        elif m.group(0) == "\n":
+            commented = False
+            line_starts.append(m.end())
+        else:
+            commented = True
+    return starts, ends, keywords, line_starts
+
+def _common_prefix(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, min(len(a), len(b)) - limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _cut_declaration(raw_decl, found_keyword):
+    cut_idx = len(raw_decl)
+    balance = 0
+    in_string = False
+    in_char = False
+
+    for i, char in enumerate(raw_decl):
+        if in_string:
+            if char == '"' and raw_decl[i-1] != '\\': in_string = False
+            continue
+        if in_char:
+            if char == "'" and raw_decl[i-1] != '\\': in_char = False
+            continue
+
+        if char == '"':
+            in_string = True
+            continue
+        if char == "'":
+            in_char = True
+            continue
+
+        if char in '({[':
+            balance += 1
+        elif char in ')}]':
+            balance -= 1
+        if balance == 0:
+            if raw_decl.startswith(":=", i):
+                cut_idx = i
+                break
+            if (raw_decl.startswith(" by ", i) or
+                raw_decl.startswith("\nby ", i) or
+                (raw_decl.startswith("by ", i) and (i==0 or raw_decl[i-1].isspace()))):
+                cut_idx = i
+                break
+            if (raw_decl.startswith(" where ", i) or
+                raw_decl.startswith("\nwhere ", i)):
+                cut_idx = i
+                break
+
+    theorem_decl = raw_decl[:cut_idx].strip()
+    if len(theorem_decl) < len(found_keyword) + 2:
+        theorem_decl = raw_decl
+    return theorem_decl
+
+class SourceIndex:
+    """Declaration and line offsets of one Lean source, for O(log n) context lookups."""
+
+    def __init__(self, source, starts, ends, keywords, line_starts):
+        self.source = source
+        self.starts = starts
+        self.ends = ends
+        self.keywords = keywords
+        self.line_starts = line_starts
+        self._is_ascii = source.isascii()
+        self._bytes = None
+        self._contexts = {}
+
+    @classmethod
+    def build(cls, source):
+        starts, ends, keywords, line_starts = _scan(source, 0, len(source))
+        return cls(source, starts, ends, keywords, [0] + line_starts)
+
+    @classmethod
+    def updated(cls, prev, source):
+        """Builds the index of `source` from `prev`, rescanning only the lines
+        between the common prefix and the common suffix of the two texts."""
+        old = prev.source
+        prefix = _common_prefix(old, source)
+        suffix = _common_suffix(old, source, prefix)
+        delta = len(source) - len(old)
+
+        line = bisect_right(prev.line_starts, prefix) - 1
+        head = prev.line_starts[line]
+        tail_new = source.find("\n", len(source) - suffix)
+        tail_new = len(source) if tail_new == -1 else tail_new + 1
+        tail_old = tail_new - delta
+
+        keep_head = bisect_left(prev.starts, head)
+        keep_tail = bisect_left(prev.starts, tail_old)
+        # The rescan already finds the line start at `tail_new` (if there is one).
+        keep_lines = bisect_right(prev.line_starts, tail_old)
+
+        starts, ends, keywords, line_starts = _scan(source, head, tail_new)
+        return cls(
+            source,
+            prev.starts[:keep_head] + starts + [s + delta for s in prev.starts[keep_tail:]],
+            prev.ends[:keep_head] + ends + [e + delta for e in prev.ends[keep_tail:]],
+            prev.keywords[:keep_head] + keywords + prev.keywords[keep_tail:],
+            prev.line_starts[:line + 1] + line_starts + [l + delta for l in prev.line_starts[keep_lines:]]
+        )
+
+    def _char_pos(self, pos):
+        if self._is_ascii:
+            return min(pos, len(self.source))
+        if self._bytes is None:
+            self._bytes = self.source.encode("utf-8")
+        return len(self._bytes[:pos].decode("utf-8", errors="ignore"))
+
+    def _implicit_hint(self, char_pos):
+        line = bisect_right(self.line_starts, char_pos) - 1
+        hint_lines = []
+        while line > 0:
+            text = self.source[self.line_starts[line - 1]:self.line_starts[line] - 1].strip()
+            if text.startswith("--"):
+                hint_lines.append(text.lstrip("-").strip())
+            elif text:
+                break
+            line -= 1
+        return "\n".join(reversed(hint_lines)) if hint_lines else None
+
+    def context_at(self, pos):
+        """Returns `(theorem_decl, implicit_hint)` for the UTF-8 byte offset `pos`."""
+        try:
+            char_pos = self._char_pos(pos)
+        except UnicodeEncodeError:
+            char_pos = min(pos, len(self.source))
+        if char_pos in self._contexts:
+            return self._contexts[char_pos]
+
+        implicit_hint = self._implicit_hint(char_pos)
+        theorem_decl = "Theorem context not found."
+        i = bisect_right(self.ends, char_pos) - 1
+        if i >= 0:
+            theorem_decl = _cut_declaration(self.source[self.starts[i]:char_pos], self.keywords[i])
+
+        self._contexts[char_pos] = (theorem_decl, implicit_hint)
+        return theorem_decl, implicit_hint
+
+def get_source_index(source):
+    """Returns the index of `source`, from the cache or by updating the most
+    recently used index incrementally."""
+    key = (len(source), hash(source))
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None and index.source == source:
+            _index_cache.move_to_end(key)
+            return index
+
+        if _index_cache:
+            prev = next(reversed(_index_cache.values()))
+            index = SourceIndex.updated(prev, source)
+        else:
+            index = SourceIndex.build(source)
+        _index_cache[key] = index
+        if len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+        return index
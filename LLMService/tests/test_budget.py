@@ -0,0 +1,23 @@
+from budget import prune_goal_state, collapse_goal_state, fit_context
+
+def test_prune_keeps_hypotheses_connected_to_the_target():
+    goal = "x y : Nat\nz : Int\nh : x < y\nhz : z = 0\n⊢ x < y + 1"
+    assert prune_goal_state(goal) == "x y : Nat\nh : x < y\n⊢ x < y + 1"
+
+def test_prune_keeps_everything_for_false_target():
+    goal = "x y : Nat\nh : x < y\nh2 : y < x\n⊢ False"
+    assert prune_goal_state(goal) == goal
+    assert prune_goal_state(goal, "unknown identifier 'h'") == goal
+
+def test_prune_keeps_everything_when_target_mentions_no_hypothesis():
+    goal = "n : Nat\nh : n > 0\n⊢ 2 + 2 = 4"
+    assert prune_goal_state(goal) == goal
+
+def test_collapse_merges_adjacent_hypotheses_of_same_type():
+    assert collapse_goal_state("a : ℕ\nb : ℕ\nh : a = b\n⊢ b = a") == "a b : ℕ\nh : a = b\n⊢ b = a"
+
+def test_fit_context_keeps_contradiction_hypotheses_over_budget():
+    goal = "x y : Nat\nh : x < y\nh2 : y < x\n⊢ False"
+    context = {"goal_state": goal, "search_results": "\n".join(f"lemma{i} : True" for i in range(50))}
+    fit_context(context, budget=10)
+    assert "h : x < y" in context["goal_state"] and "h2 : y < x" in context["goal_state"]
@@ -0,0 +1,56 @@
+import json
+import sqlite3
+import pytest
+from cache import CacheManager
+from goals import canonicalize_goal
+
+GOAL = "x y : Nat\nh : x = y\n⊢ y = x"
+RENAMED = "a b : Nat\nhab : a = b\n⊢ b = a"
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_L2_CACHE_URL", raising=False)
+    return CacheManager(db_path=str(tmp_path / "cache.db"))
+
+def test_alpha_renamed_goal_is_not_an_exact_hit(cache):
+    cache.set(GOAL, None, "next", "exact h.symm")
+    assert cache.get(GOAL, None, "next") == "exact h.symm"
+    assert cache.get("x  y : Nat\nh :  x = y\n⊢ y =  x", None, "next") == "exact h.symm"
+    assert cache.get(RENAMED, None, "next") is None
+
+def test_alpha_renamed_goal_is_still_similar(cache):
+    assert canonicalize_goal(GOAL) == canonicalize_goal(RENAMED)
+    cache.set(GOAL, None, "next", "exact h.symm")
+    [(goal, code, score)] = cache.similar(RENAMED, k=3)
+    assert (goal, code, score) == (GOAL, "exact h.symm", 1.0)
+
+def test_failures_are_not_shared_with_alpha_renamed_goals(cache):
+    failing_here = "a b : Nat\nhab : a = b\n⊢ b = a"
+    works_here = "a b : Nat\nh : a = b\n⊢ b = a"
+    cache.add_failure(failing_here, "exact h.symm", "missing", "unknown identifier 'h.symm'")
+    assert "exact h.symm" in cache.failures(failing_here)
+    assert "exact h.symm" in cache.failures("a  b : Nat\nhab :  a = b\n⊢ b = a")
+    assert cache.failures(works_here) == {}
+
+def test_legacy_migration_is_retried_after_a_locked_database(cache, tmp_path, monkeypatch):
+    legacy = tmp_path / "llm_cache.json"
+    legacy.write_text(json.dumps({"legacy-key": "simp"}))
+    cache.legacy_file = str(legacy)
+    real = cache.store.connect()
+
+    class LockedConnection:
+        in_transaction = False
+
+        def execute(self, sql, *args):
+            if sql == "BEGIN IMMEDIATE":
+                raise sqlite3.OperationalError("database is locked")
+            return real.execute(sql, *args)
+
+    with monkeypatch.context() as m:
+        m.setattr(cache.store, "connect", lambda: LockedConnection())
+        cache._ensure_migrated()
+    assert not cache._migrated and legacy.exists()
+
+    cache._ensure_migrated()
+    assert cache._migrated and not legacy.exists()
+    assert real.execute("SELECT code FROM tactics WHERE key = 'legacy-key'").fetchone() == ("simp",)
@@ -0,0 +1,42 @@
+import pytest
+from core import LLMCore
+from errors import DeadlineExceeded
+
+GOAL = "x y : Nat\nh : x = y\n⊢ y = x"
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LLM_CACHE_DB", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("LLM_SINGLEFLIGHT", "false")
+    monkeypatch.delenv("LLM_L2_CACHE_URL", raising=False)
+    core = LLMCore(prefetch=False)
+    core.cache_manager.set(GOAL, None, "next", "exact h.symm")
+    return core
+
+def degraded(core, goal, request_type="init_next"):
+    return core.degraded_response({"requestType": request_type, "goalState": goal}, DeadlineExceeded("budget"))
+
+def test_degraded_answer_reuses_tactic_of_same_goal(core):
+    response = degraded(core, "x  y : Nat\nh : x = y\n⊢ y =  x")
+    assert (response["tactic"], response["success"], response["degraded"]) == ("exact h.symm", True, True)
+    assert response["errorType"] == "deadline"
+
+def test_degraded_answer_skips_renamed_hypotheses(core):
+    response = degraded(core, "a b : Nat\nhab : a = b\n⊢ b = a")
+    assert (response["tactic"], response["success"], response["degraded"]) == ("", False, True)
+
+def test_degraded_answer_skips_loosely_similar_goals(core):
+    response = degraded(core, "x y : Nat\nh : x = y\n⊢ y + 0 = x * 1 + 0")
+    assert response["tactic"] == "" and not response["success"]
+
+def test_degraded_answer_skips_known_failures(core):
+    core.cache_manager.add_failure(GOAL, "exact h.symm", "failure", "failed")
+    assert degraded(core, GOAL)["tactic"] == ""
+
+def test_degraded_answer_for_diagnose_is_structured_timeout(core):
+    response = degraded(core, GOAL, "diagnose_next")
+    assert response == {
+        "tactic": "", "searchQuery": None, "analysis": None, "success": False,
+        "message": "budget", "errorType": "deadline", "degraded": True
+    }
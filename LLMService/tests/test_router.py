@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from errors import ProviderUnavailable
+from router import BackendStats, RoutingProvider
+
+COOLDOWN = 30.0
+
+class FakeProvider:
+    def __init__(self, answer=None, fail=False, stall=False):
+        self.answer, self.fail, self.stall = answer, fail, stall
+        self.calls = 0
+        self.cancelled = 0
+
+    async def agenerate(self, system_prompt, user_prompt, stop_when=None, history=None):
+        self.calls += 1
+        if self.fail:
+            raise ProviderUnavailable("backend down")
+        if self.stall:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return self.answer
+
+class FakeBackend:
+    def __init__(self, name, provider, latency=None):
+        self.name, self.tier, self.provider = name, "fast", provider
+        self.stats = BackendStats(50, 3, COOLDOWN)
+        for _ in range(20 if latency is not None else 0):
+            self.stats.record_success(latency)
+
+    def expected_latency(self):
+        ewma = self.stats.ewma
+        return 0.0 if ewma is None else ewma * (1 + 4 * self.stats.error_rate)
+
+def make_router(*backends, hedge=True):
+    router = RoutingProvider.__new__(RoutingProvider)
+    router.backends, router.min_samples, router.hedge = list(backends), 10, hedge
+    return router
+
+def route(router, hedged=True):
+    call = lambda provider: provider.agenerate("system", "user")
+    return asyncio.run(router._route("next_tactic", call, hedged))
+
+def expire_cooldown(stats):
+    stats.opened_at -= COOLDOWN
+
+def test_hedge_returns_the_backup_and_cancels_the_slow_primary():
+    slow = FakeBackend("slow", FakeProvider("slow answer", stall=True), latency=0.05)
+    backup = FakeBackend("backup", FakeProvider("backup answer"), latency=0.2)
+    router = make_router(slow, backup)
+    assert [b.name for b in router.candidates("next_tactic")] == ["slow", "backup"]
+
+    assert route(router) == "backup answer"
+    assert slow.provider.cancelled == 1
+    assert slow.stats.consecutive_failures == 0 and slow.stats.opened_at is None
+    assert len(slow.stats.latencies) == 20  # a lost race does not count towards p95
+
+def test_no_hedge_without_enough_samples():
+    slow = FakeBackend("slow", FakeProvider("slow answer"))
+    backup = FakeBackend("backup", FakeProvider("backup answer"), latency=0.2)
+    router = make_router(slow, backup)
+    assert router.hedge_delay(slow) is None
+    assert route(router) == "slow answer"
+    assert backup.provider.calls == 0
+
+def test_failing_backend_trips_the_breaker_and_recovers():
+    failing = FakeBackend("failing", FakeProvider("recovered", fail=True), latency=0.01)
+    healthy = FakeBackend("healthy", FakeProvider("healthy answer"), latency=0.5)
+    router = make_router(failing, healthy, hedge=False)
+
+    for _ in range(3):
+        assert route(router) == "healthy answer"
+    assert failing.provider.calls == 3
+    assert failing.stats.opened_at is not None
+    assert [b.name for b in router.candidates("next_tactic")] == ["healthy"]
+    assert route(router) == "healthy answer"
+    assert failing.provider.calls == 3
+
+    expire_cooldown(failing.stats)
+    failing.provider.fail = False
+    assert "failing" in [b.name for b in router.candidates("next_tactic")]
+    assert route(router) == "recovered"
+    assert failing.stats.opened_at is None and failing.stats.consecutive_failures == 0
+
+def test_failed_half_open_trial_reopens_the_breaker():
+    stats = BackendStats(50, 3, COOLDOWN)
+    for _ in range(3):
+        stats.record_failure()
+    expire_cooldown(stats)
+    assert stats.acquire()
+    stats.record_failure()
+    assert not stats.available() and not stats.acquire()
+
+def test_only_one_half_open_trial():
+    failing = FakeBackend("failing", FakeProvider(fail=True))
+    router = make_router(failing)
+    for _ in range(3):
+        failing.stats.record_failure()
+    assert router.candidates("next_tactic") == []
+    with pytest.raises(ProviderUnavailable):
+        route(router)
+
+    expire_cooldown(failing.stats)
+    for _ in range(5):
+        assert router.candidates("next_tactic") == [failing]
+    assert failing.stats.available()
+
+    assert failing.stats.acquire()
+    assert not failing.stats.acquire()
+    assert not failing.stats.available()
+    assert router.candidates("next_tactic") == []
@@ -0,0 +1,33 @@
+import pytest
+import search_cache
+from search_cache import SearchCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return SearchCache(db_path=str(tmp_path / "cache.db"), max_entries=8, ttl=3600)
+
+def stored_hits(cache, key):
+    return cache.store.execute("SELECT hits FROM search_cache WHERE key = ?", (key,)).fetchone()[0]
+
+def test_hits_are_written_in_batches(cache, monkeypatch):
+    monkeypatch.setattr(search_cache, "FLUSH_HITS", 5)
+    cache.put("k", "add comm", ["Nat.add_comm : a + b = b + a"], 0.25)
+    for _ in range(4):
+        assert cache.get("k") == ["Nat.add_comm : a + b = b + a"]
+    assert stored_hits(cache, "k") == 0
+    cache.get("k")
+    assert stored_hits(cache, "k") == 5
+
+def test_stats_include_unflushed_hits(cache):
+    cache.put("k", "add comm", ["Nat.add_comm"], 0.5)
+    cache.get("k")
+    cache.get("k")
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["savedSeconds"]) == (1, 2, 1.0)
+
+def test_disk_hits_after_a_restart_are_counted(cache, tmp_path):
+    cache.put("k", "add comm", ["Nat.add_comm"], 0.5)
+    reopened = SearchCache(db_path=str(tmp_path / "cache.db"), max_entries=8, ttl=3600)
+    assert reopened.get("k") == ["Nat.add_comm"]
+    reopened.flush_hits()
+    assert stored_hits(reopened, "k") == 1
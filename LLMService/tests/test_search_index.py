@@ -0,0 +1,48 @@
+import os
+import json
+import threading
+from search_index import build_index, get_search_index
+
+def write_dump(path, names):
+    with open(path, "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(json.dumps({"name": name, "type": "Nat → Nat → Prop"}) + "\n")
+
+def test_rebuild_swaps_atomically_and_retires_old_index(tmp_path):
+    dump, out = tmp_path / "decls.jsonl", tmp_path / "index"
+    write_dump(dump, ["Nat.add_comm", "Nat.mul_comm"])
+    build_index(str(dump), str(out))
+    old = get_search_index(str(out))
+    assert [text for _, text in old.search("mul comm", 1)] == ["Nat.mul_comm : Nat → Nat → Prop"]
+
+    misses, stop = [], threading.Event()
+    def watch():
+        while not stop.is_set():
+            if not os.path.exists(out / "meta.json"):
+                misses.append(1)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    for i in range(5):
+        write_dump(dump, [f"Foo.bar{j}" for j in range(200 * (i + 1))] + ["Nat.add_comm"])
+        build_index(str(dump), str(out))
+    stop.set()
+    watcher.join()
+    assert misses == []
+
+    new = get_search_index(str(out))
+    assert new is not old and new.n_docs == 1001
+    assert old._closed
+    # A caller still holding the retired index is served by the current one.
+    assert [text for _, text in old.search("add comm", 1)] == ["Nat.add_comm : Nat → Nat → Prop"]
+    versions = [e for e in os.listdir(tmp_path) if e.startswith(".index.")]
+    assert len(versions) == 2 and os.path.islink(out)
+
+def test_build_replaces_plain_directory_from_older_builds(tmp_path):
+    dump, out = tmp_path / "decls.jsonl", tmp_path / "index"
+    write_dump(dump, ["Nat.add_comm"])
+    out.mkdir()
+    (out / "meta.json").write_text("{}")
+    build_index(str(dump), str(out))
+    assert os.path.islink(out)
+    assert get_search_index(str(out)).n_docs == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(["decls.jsonl", "index", os.readlink(out)])
@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import threading
+import pytest
+from singleflight import SingleFlight
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLIGHT = """
+import os, sys, json, time
+sys.path.insert(0, {service_dir!r})
+from singleflight import SingleFlight
+
+def call():
+    with open({calls!r}, "a") as f:
+        f.write(f"{{os.getpid()}}\\n")
+    time.sleep(1.0)
+    return {{"answer": os.getpid()}}
+
+print(json.dumps(SingleFlight({directory!r}).do("key", call)))
+"""
+
+@pytest.mark.skipif(os.name != "posix", reason="cross-process single-flight needs flock")
+def test_two_processes_coalesce_and_clean_up(tmp_path):
+    directory, calls = tmp_path / "flights", tmp_path / "calls"
+    script = FLIGHT.format(service_dir=SERVICE_DIR, calls=str(calls), directory=str(directory))
+    first = subprocess.Popen([sys.executable, "-c", script], cwd=tmp_path, stdout=subprocess.PIPE, text=True)
+    time.sleep(0.4)
+    second = subprocess.Popen([sys.executable, "-c", script], cwd=tmp_path, stdout=subprocess.PIPE, text=True)
+    results = [json.loads(p.communicate(timeout=30)[0]) for p in (first, second)]
+
+    assert len(calls.read_text().splitlines()) == 1
+    assert results[0][0] == results[1][0]
+    assert sorted(str(shared) for _, shared in results) == ["None", "shared"]
+    assert os.listdir(directory) == []
+
+def test_threads_coalesce_onto_one_call(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    calls, results = [], []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.3)
+        return "value"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", call))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(results, key=str) == [("value", "process")] * 3 + [("value", None)]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,32 @@
+import random
+import pytest
+from source_index import SourceIndex
+
+PIECES = ["\n", "\n", " ", "x", "ℕ", "--", "-- hint", "theorem", "lemma t", " := by", "  trivial", "(a : Nat)"]
+
+def random_source(rng):
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 30)))
+
+def mutate(rng, source):
+    i = rng.randint(0, len(source))
+    j = rng.randint(i, min(len(source), i + rng.randint(0, 10)))
+    return source[:i] + random_source(rng)[:rng.randint(0, 12)] + source[j:]
+
+def fields(index):
+    return index.starts, index.ends, index.keywords, index.line_starts
+
+@pytest.mark.parametrize("seed", range(20))
+def test_updated_matches_build(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        old = random_source(rng)
+        new = mutate(rng, old)
+        assert fields(SourceIndex.updated(SourceIndex.build(old), new)) == fields(SourceIndex.build(new)), (old, new)
+
+def test_edit_reaching_end_of_file():
+    assert SourceIndex.updated(SourceIndex.build("ℕ"), "\n").line_starts == [0, 1]
+    old = "theorem t : True := by\n  trivial"
+    new = "theorem t : True := by\n  -- use trivial\n"
+    pos = len(new.encode("utf-8"))
+    assert SourceIndex.updated(SourceIndex.build(old), new).context_at(pos) == SourceIndex.build(new).context_at(pos)
+    assert SourceIndex.build(new).context_at(pos)[1] == "use trivial"
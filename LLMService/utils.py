@@ -1,20 +1,21 @@
 import os
 import json
-import hashlib
 import re
+import gzip
 import time
-import requests
-from datetime import datetime
-from urllib.parse import urlencode
-
+import queue
+import atexit
+import threading
+from source_index import get_source_index
 try:
-    from bs4 import BeautifulSoup
+    import fcntl
 except ImportError:
-    BeautifulSoup = None
+    fcntl = None
 
 LOG_FILE = "llm_agent.log"
 CACHE_FILE = "llm_cache.json"
 CONFIG_FILE = "config.json"
+SEARCH_INDEX_DIR = "search-index"
 
 _config_cache = None
 
@@ -31,7 +32,7 @@ def _load_config():
                 log_message(f"✅ Loaded configuration from {CONFIG_FILE}")
                 return _config_cache
         except Exception as e:
-            log_message(f"⚠️  Error loading {CONFIG_FILE}: {e}. Falling back to environment variables.")
+            log_message(f"⚠️  Error loading {CONFIG_FILE}: {e}. Falling back to environment variables.", level="WARNING")
             _config_cache = {}
             return _config_cache
     
@@ -44,55 +45,109 @@ def getenv(key, default=None):
         return config[key]
     return os.getenv(key, default)
 
-def log_message(msg):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    formatted_msg = f"[{timestamp}] {msg}"
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(formatted_msg + "\n")
-    except Exception:
-        pass
-
-class CacheManager:
-    def __init__(self):
-        self.cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_FILE)
-        self.cache = self._load_cache()
-
-    def _load_cache(self):
-        if not os.path.exists(self.cache_file):
-            return {}
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+class LogWriter:
+    """Appends log lines to `path` from a background thread.
+
+    `write` only enqueues (dropping lines when the bounded queue is full), and
+    the writer thread appends whole batches while holding an exclusive `flock`,
+    so several service processes can share one file. Past `max_bytes` the
+    file is gzipped into `path.1.gz` (older archives shift up to `backups`)
+    and truncated in place.
+    """
+
+    def __init__(self, path, max_bytes, backups, queue_size):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="llm-log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, line):
         try:
-            with open(self.cache_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
 
-    def _save_cache(self):
+    def close(self):
         try:
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.cache, f, indent=2)
-        except Exception as e:
-            log_message(f"⚠️ Failed to save cache: {e}")
-
-    def _generate_key(self, goal, hint, work_type):
-        g = (goal or "").strip()
-        h = (hint or "None").strip()
-        w = (work_type or "").strip()
-        raw_key = f"{g}||{h}||{w}"
-        return hashlib.md5(raw_key.encode('utf-8')).hexdigest()
-
-    def get(self, goal, hint, work_type):
-        key = self._generate_key(goal, hint, work_type)
-        if key in self.cache:
-            log_message(f"⚡ Cache Hit for [{work_type}]")
-            return self.cache[key]
-        return None
-
-    def set(self, goal, hint, work_type, code):
-        key = self._generate_key(goal, hint, work_type)
-        self.cache[key] = code
-        self._save_cache()
-        log_message(f"💾 Cached success for [{work_type}]")
+            self.queue.put(None, timeout=1)
+        except queue.Full:
+            return
+        self.thread.join(timeout=2)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < 1024:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is None
+            lines = [line for line in batch if line is not None]
+            if lines:
+                self._flush(lines)
+            if done:
+                return
+
+    def _flush(self, lines):
+        if self.dropped:
+            lines.append(f"[{time.strftime('%H:%M:%S')}] ⚠️ {self.dropped} log lines dropped (queue full)\n")
+            self.dropped = 0
+        data = "".join(lines).encode("utf-8")
+        try:
+            with open(self.path, "ab") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                if self.max_bytes and os.fstat(f.fileno()).st_size + len(data) > self.max_bytes:
+                    self._rotate(f)
+                f.write(data)
+        except Exception:
+            pass
+
+    def _rotate(self, f):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}.gz"):
+                os.replace(f"{self.path}.{i}.gz", f"{self.path}.{i + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz.tmp", "wb") as dst:
+                while chunk := src.read(1 << 20):
+                    dst.write(chunk)
+            os.replace(f"{self.path}.1.gz.tmp", f"{self.path}.1.gz")
+        f.truncate(0)
+
+_log_writer = None
+_log_level = None
+_log_lock = threading.Lock()
+
+def _get_log_writer():
+    global _log_writer, _log_level
+    with _log_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter(
+                LOG_FILE,
+                int(getenv("LLM_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+                int(getenv("LLM_LOG_BACKUPS", 3)),
+                int(getenv("LLM_LOG_QUEUE", 10000)),
+            )
+        return _log_writer
+
+def log_message(msg, level="INFO"):
+    """Queues `msg` for the log file. Full prompts and responses are logged at
+    DEBUG, below the default `LLM_LOG_LEVEL` (INFO), so they are dropped here."""
+    global _log_level
+    if _log_level is None:
+        _log_level = LOG_LEVELS.get(str(getenv("LLM_LOG_LEVEL", "INFO")).upper(), 20)
+    if LOG_LEVELS.get(level, 20) < _log_level:
+        return
+    timestamp = time.strftime("%H:%M:%S")
+    prefix = "" if level == "INFO" else f"{level} "
+    _get_log_writer().write(f"[{timestamp}] {prefix}{msg}\n")
 
 def classify_error(error_msg):
     msg = error_msg.lower()
@@ -128,108 +183,7 @@ def classify_error(error_msg):
 def extract_context_from_source(source, pos):
     if not source or pos is None:
         return None, None
-
-    # 提取隐式提示
-    try:
-        source_bytes = source.encode('utf-8')
-        if pos > len(source_bytes):
-            pos = len(source_bytes)
-        prefix_bytes = source_bytes[:pos]
-        prefix = prefix_bytes.decode('utf-8', errors='ignore')
-    except Exception as e:
-        prefix = source[:pos]
-
-    lines = prefix.split('\n')
-    
-    implicit_hint = None
-    hint_lines = []
-    
-    if lines:
-        lines.pop()
-
-    while lines:
-        line = lines[-1].strip()
-        if line.startswith("--"):
-            content = line.lstrip("-").strip()
-            hint_lines.append(content)
-            lines.pop()
-        elif not line:
-            lines.pop()
-        else:
-            break
-
-    if hint_lines:
-        implicit_hint = "\n".join(reversed(hint_lines))
-
-    # 提取定理声明
-    keywords = ["theorem", "lemma", "def", "instance", "example", "structure", "class"]
-    decl_start_index = -1
-    found_keyword = ""
-
-    for keyword in keywords:
-        pattern = re.compile(r'\b' + keyword + r'\b')
-        for match in pattern.finditer(prefix):
-            match_idx = match.start()
-            
-            line_start = prefix.rfind('\n', 0, match_idx) + 1
-            line_before_kw = prefix[line_start:match_idx]
-            if "--" in line_before_kw:
-                continue
-            if match_idx > decl_start_index:
-                decl_start_index = match_idx
-                found_keyword = keyword
-    
-    theorem_decl = "Theorem context not found."
-
-    if decl_start_index != -1:
-        raw_decl = prefix[decl_start_index:]
-        cut_idx = len(raw_decl)
-        balance = 0
-        in_string = False
-        in_char = False
-        found_end = False
-        
-        for i, char in enumerate(raw_decl):
-            if in_string:
-                if char == '"' and raw_decl[i-1] != '\\': in_string = False
-                continue
-            if in_char:
-                if char == "'" and raw_decl[i-1] != '\\': in_char = False
-                continue
-                
-            if char == '"': 
-                in_string = True
-                continue
-            if char == "'": 
-                in_char = True
-                continue
-
-            if char in '({[':
-                balance += 1
-            elif char in ')}]':
-                balance -= 1
-            if balance == 0:
-                if raw_decl[i:].startswith(":="):
-                    cut_idx = i
-                    found_end = True
-                    break
-                if (raw_decl[i:].startswith(" by ") or 
-                    raw_decl[i:].startswith("\nby ") or
-                    (raw_decl[i:].startswith("by ") and (i==0 or raw_decl[i-1].isspace()))):
-                    cut_idx = i
-                    found_end = True
-                    break
-                if (raw_decl[i:].startswith(" where ") or 
-                    raw_decl[i:].startswith("\nwhere ")):
-                    cut_idx = i
-                    found_end = True
-                    break
-
-        theorem_decl = raw_decl[:cut_idx].strip()
-        if len(theorem_decl) < len(found_keyword) + 2:
-            theorem_decl = raw_decl
-
-    return theorem_decl, implicit_hint
+    return get_source_index(source).context_at(pos)
 
 def find_code(lang, text):
     pattern = r'```(\w*)?\s*\n(.*?)\n```'
@@ -252,85 +206,43 @@ def find_code(lang, text):
         return fallback_block
     return text
 
-def perform_lean_search(query: str):
-    raise NotImplementedError("Won't work.")
-    if not requests or not BeautifulSoup:
+def perform_lean_search(query: str, top_k: int = 20):
+    if not query or query == "NONE":
+        return {"success": True, "results": "No search performed.", "message": "OK"}
+
+    index_path = getenv("LLM_SEARCH_INDEX") or os.path.join(os.path.dirname(os.path.abspath(__file__)), SEARCH_INDEX_DIR)
+    if not os.path.exists(os.path.join(index_path, "meta.json")):
         return {
             "success": False,
             "results": "",
-            "message": "Required libraries not installed. Please run 'pip install requests beautifulsoup4'."
+            "message": f"Search index not found at {index_path}. Export declarations with `#llm_export_decls` and run 'python search_index.py build <decls.jsonl> <index dir>'."
         }
 
-    base_url = "https://leansearch.net/"
-    params = {"q": query}
-    search_url = base_url + "?" + urlencode(params)
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.4472.124 Safari/537.36"
-    }
-
-    max_retries = 5
-    delay = 1
-
-    for attempt in range(max_retries):
+    from search_index import get_search_index
+    from search_cache import get_search_cache
+    cache = get_search_cache()
+    key = cache.key(index_path, query, top_k)
+    hits = cache.get(key)
+    if hits is None:
+        start = time.perf_counter()
         try:
-            response = requests.get(search_url, headers=headers, timeout=15)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, "lxml")
-            cards = soup.find_all("article", class_="card")
-
-            if not cards:
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-                    continue
-                else:
-                    return {
-                        "success": True,
-                        "results": f"Search for \"{query}\" failed after {max_retries} attempts, likely due to rate limiting. The server returned an empty result page.",
-                        "message": "Rate limit suspected."
-                    }
-            
-            formatted_results = []
-            for card in cards[:20]:
-                name_tag = card.find("span", class_="formal-name")
-                type_tag = card.find("pre", class_="formal-statement")
-                if name_tag and type_tag:
-                    name = name_tag.get_text(strip=True)
-                    type_info = type_tag.get_text(strip=True)
-                    if name and type_info:
-                        formatted_results.append(f"{name} : {type_info}")
-
-            if not formatted_results:
-                return {
-                    "success": True,
-                    "results": f"Could not parse any valid theorems from leansearch.net for query: \"{query}\"",
-                    "message": "Parsing failed on received HTML."
-                }
-            return {
-                "success": True,
-                "results": "\n".join(formatted_results),
-                "message": "OK"
-            }
-
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                time.sleep(delay)
-            else:
-                return {
-                    "success": False,
-                    "results": "",
-                    "message": f"HTTP request failed after {max_retries} retries: {e}"
-                }
+            hits = [text for _, text in get_search_index(index_path).search(query, top_k)]
         except Exception as e:
             return {
                 "success": False,
                 "results": "",
-                "message": f"An unexpected error occurred during web scraping: {e}"
+                "message": f"An unexpected error occurred during local search: {e}"
             }
-            
+        cache.put(key, query, hits, time.perf_counter() - start)
+
+    if not hits:
+        return {
+            "success": True,
+            "results": f"No theorems found matching any of: {query}",
+            "message": "OK"
+        }
     return {
-        "success": False,
-        "results": "",
-        "message": "Search failed unexpectedly after all retries."
-    }
\ No newline at end of file
+        "success": True,
+        "results": "\n".join(hits),
+        "message": "OK"
+    }
@@ -24,6 +24,7 @@ inductive WorkPhase where
   | Init
   | Diagnose
   | Fix
+  | Repair
   deriving Inhabited, BEq, Repr
 
 instance : ToString WorkPhase where
@@ -31,6 +32,7 @@ instance : ToString WorkPhase where
     | .Init     => "init"
     | .Diagnose => "diagnose"
     | .Fix      => "fix"
+    | .Repair   => "repair"
 
 def WorkType.defaultFuel : WorkType → Nat
   | .Next      => 6
@@ -58,6 +60,10 @@ structure LlmResponse where
   analysis    : Option String
   success     : Bool
   message     : String
+  tactics     : Option (List String) := none
+  searchResults : Option String := none
+  knownError  : Option String := none
+  errorType   : Option String := none
   deriving FromJson
 
 inductive LlmAction where
@@ -107,8 +113,77 @@ def findPythonScriptPath : IO String := do
     s!"  3. ./.lake/packages/*/{relativePath}\n\n" ++
     "Please ensure the package is built or set LEAN_LLM_SCRIPT_PATH as the path of LLMService/service.py."
 
-def callPythonService {α β : Type} [ToJson α] [FromJson β] (req : α) (extraArgs : Array String := #[]) : IO β := do
-  let jsonStr := (ToJson.toJson req).compress ++ "\n"
+structure DaemonHandle where
+  child : IO.Process.Child ⟨.piped, .piped, .inherit⟩
+
+/-- Idle `service.py --serve` processes, reused across requests when `LEAN_LLM_DAEMON` is set. -/
+initialize daemonPool : IO.Ref (Array DaemonHandle) ← IO.mkRef #[]
+
+def isDaemonEnabled : IO Bool := do
+  match ← IO.getEnv "LEAN_LLM_DAEMON" with
+  | some v => return v == "1" || v.toLower == "true"
+  | none => return false
+
+def taskOfArgs (extraArgs : Array String) : String :=
+  match extraArgs.toList.dropWhile (· != "--task") with
+  | _ :: task :: _ => task
+  | _ => "llm"
+
+def decodeServiceOutput {β : Type} [FromJson β] (outStr : String) : IO β := do
+  match Json.parse outStr with
+  | Except.ok json =>
+    match FromJson.fromJson? json with
+    | Except.ok res => return res
+    | Except.error e => throw <| IO.userError s!"JSON decode error: {e}"
+  | Except.error e => throw <| IO.userError s!"JSON parse error: {e}. Output: {outStr}"
+
+def spawnDaemon : IO DaemonHandle := do
+  let scriptPath ← findPythonScriptPath
+  let pythonCmd ← IO.getEnv "LEAN_LLM_PYTHON"
+  let child ← IO.Process.spawn {
+    cmd := pythonCmd.getD "python3"
+    args := #[scriptPath, "--serve"]
+    stdin := IO.Process.Stdio.piped
+    stdout := IO.Process.Stdio.piped
+    stderr := IO.Process.Stdio.inherit
+  }
+  return { child }
+
+/-- Writes one request line to an idle (or new) daemon; `none` when it could not be delivered. -/
+def sendToDaemon (task : String) (payload : Json) : IO (Option DaemonHandle) := do
+  let idle? ← daemonPool.modifyGet fun pool => (pool.back?, pool.pop)
+  try
+    let handle ← match idle? with
+      | some h => pure h
+      | none => spawnDaemon
+    try
+      let line := (Json.mkObj [("task", toJson task), ("request", payload)]).compress
+      handle.child.stdin.putStrLn line
+      handle.child.stdin.flush
+      return some handle
+    catch e =>
+      try handle.child.kill catch _ => pure ()
+      throw e
+  catch e =>
+    IO.eprintln s!"[LLMTools] Daemon unavailable ({e}), falling back to one-shot service."
+    return none
+
+/-- Returns the daemon's reply, or `none` if the request never reached a daemon.
+Errors after delivery are raised rather than retried one-shot: the daemon may
+already have acted on the request (e.g. recorded a `report_success`). -/
+def callDaemon (task : String) (payload : Json) : IO (Option String) := do
+  let some handle ← sendToDaemon task payload | return none
+  try
+    let outStr ← handle.child.stdout.getLine
+    if outStr.isEmpty then
+      throw <| IO.userError "[LLMTools] Daemon closed its output."
+    daemonPool.modify (·.push handle)
+    return some outStr
+  catch e =>
+    try handle.child.kill catch _ => pure ()
+    throw e
+
+def callPythonServiceOnce (jsonStr : String) (extraArgs : Array String) : IO String := do
   let scriptPath ← findPythonScriptPath
 
   let pythonCmd ← IO.getEnv "LEAN_LLM_PYTHON"
@@ -126,11 +201,19 @@ def callPythonService {α β : Type} [ToJson α] [FromJson β] (req : α) (extra
   stdin.flush
   let outputTask ← IO.asTask child.stdout.readToEnd Task.Priority.dedicated
   let _ ← child.wait
-  let outStr ← IO.ofExcept outputTask.get
+  IO.ofExcept outputTask.get
 
-  match Json.parse outStr with
-  | Except.ok json =>
-    match FromJson.fromJson? json with
-    | Except.ok res => return res
-    | Except.error e => throw <| IO.userError s!"JSON decode error: {e}"
-  | Except.error e => throw <| IO.userError s!"JSON parse error: {e}. Output: {outStr}"
+/-- Adds the per-request latency budget from `LEAN_LLM_DEADLINE_MS` (in milliseconds) as `deadlineMs`. -/
+def withDeadline (payload : Json) : IO Json := do
+  match (← IO.getEnv "LEAN_LLM_DEADLINE_MS").bind String.toNat? with
+  | some ms => if ms > 0 then return payload.setObjVal! "deadlineMs" (toJson ms) else return payload
+  | none => return payload
+
+def callPythonService {α β : Type} [ToJson α] [FromJson β] (req : α) (extraArgs : Array String := #[]) : IO β := do
+  let payload ← withDeadline (ToJson.toJson req)
+  if ← isDaemonEnabled then
+    if let some outStr ← callDaemon (taskOfArgs extraArgs) payload then
+      return ← decodeServiceOutput outStr
+
+  let outStr ← callPythonServiceOnce (payload.compress ++ "\n") extraArgs
+  decodeServiceOutput outStr
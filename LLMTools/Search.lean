@@ -5,14 +5,14 @@ open Lean Meta Elab Tactic
 
 inductive SearchProvider where
   | localEnv
-  | leanSearchNet
+  | serviceIndex
   deriving Inhabited, BEq
 
 def getSearchProviderFromEnv : IO SearchProvider := do
   let providerStr ← IO.getEnv "LEAN_LLM_SEARCH_PROVIDER"
   match providerStr with
-  | some "leansearch" => pure .leanSearchNet
-  | _                 => pure .localEnv
+  | some "index" | some "leansearch" => pure .serviceIndex
+  | _                                => pure .localEnv
 
 def findTheoremsLocal (keywords : String) : TacticM String := do
   if keywords == "NONE" || keywords == "" then return "No search performed."
@@ -58,8 +58,8 @@ structure SearchResponse where
   message : String
   deriving FromJson
 
-unsafe def findTheoremsWeb (keywords : String) : TacticM String := do
-  logInfo "[Search] Using leansearch.net provider..."
+unsafe def findTheoremsIndex (keywords : String) : TacticM String := do
+  logInfo "[Search] Using offline search index..."
   let req : SearchRequest := { query := keywords }
 
   let res : SearchResponse ← runIO (callPythonService req #["--task", "search"])
@@ -67,7 +67,7 @@ unsafe def findTheoremsWeb (keywords : String) : TacticM String := do
   if res.success then
     return res.results
   else
-    throwError s!"[Web Search Error] {res.message}"
+    throwError s!"[Index Search Error] {res.message}"
 
 unsafe def findTheorems (keywords : String) : TacticM String := do
   if keywords == "NONE" || keywords == "" then return "No search performed."
@@ -75,4 +75,21 @@ unsafe def findTheorems (keywords : String) : TacticM String := do
   let provider ← runIO getSearchProviderFromEnv
   match provider with
   | .localEnv => findTheoremsLocal keywords
-  | .leanSearchNet => findTheoremsWeb keywords
+  | .serviceIndex => findTheoremsIndex keywords
+
+/-- Writes every public declaration of the current environment to `path` as JSONL
+(`{"name", "type", "doc"}` per line), the input of `LLMService/search_index.py build`. -/
+elab "#llm_export_decls " path:str : command => do
+  let env ← getEnv
+  let handle ← IO.FS.Handle.mk path.getString .write
+  let mut count := 0
+  for (name, info) in env.constants.toList do
+    if info.isUnsafe || Lean.Name.isInternal name then continue
+    try
+      let type ← Command.liftTermElabM <| Meta.ppExpr info.type
+      let doc ← findDocString? env name
+      let entry := Json.mkObj [("name", toJson name.toString), ("type", toJson s!"{type}"), ("doc", toJson doc)]
+      handle.putStrLn entry.compress
+      count := count + 1
+    catch _ => continue
+  logInfo s!"[Search] Exported {count} declarations to {path.getString}"
@@ -44,6 +44,21 @@ def runStrictCheck (tacticStx : Syntax) : TacticM Unit := do
     finally
       modifyThe Core.State fun s => { s with messages := oldMsgs }
 
+inductive CandidateResult where
+  | ok (code : String) (stx : TSyntax `tactic)
+  | syntaxError (code : String) (msg : String)
+  | logicError (code : String) (msg : String)
+
+def checkCandidate (code : String) : TacticM CandidateResult := do
+  match parseToWrappedTactic (← getEnv) code with
+  | Except.error e => return .syntaxError code e
+  | Except.ok wrappedTStx =>
+    try
+      runStrictCheck (unwrapTactic wrappedTStx)
+      return .ok code wrappedTStx
+    catch e =>
+      return .logicError code (← e.toMessageData.toString)
+
 unsafe def generateLlmTactic (fuel : Nat) (wType : WorkType) (phase : WorkPhase) (req : LlmRequest) (refStx : Syntax)
                              : TacticM (Option (String × TSyntax `tactic)) := do
   if fuel == 0 then
@@ -68,6 +83,10 @@ unsafe def generateLlmTactic (fuel : Nat) (wType : WorkType) (phase : WorkPhase)
 
     let res ← runIO (callLlmService currentReq)
     if ¬res.success then
+      -- Out of latency budget with nothing cached to fall back on: give up on this goal quietly.
+      if res.errorType == some "deadline" then
+        logWarning s!"{logPrefix} {res.message}"
+        return none
       throwError s!"Service Error: {res.message}"
 
     if phase == .Diagnose then
@@ -85,45 +104,79 @@ unsafe def generateLlmTactic (fuel : Nat) (wType : WorkType) (phase : WorkPhase)
       generateLlmTactic fuel wType .Fix fixReq refStx
 
     else
-      let tacticCode := res.tactic
+      -- A repair response already went through diagnose and search in the service.
+      let req := if phase == .Repair then
+          { req with searchResults := res.searchResults, diagnosisInfo := some (res.analysis.getD "No analysis provided.") }
+        else req
+      if phase == .Repair then
+        logInfo s!"[Diagnosis] Analysis: {res.analysis.getD "No analysis provided."}"
+        if res.searchQuery.getD "NONE" != "NONE" then
+          logInfo s!"[Search] Found:\n{res.searchResults.getD ""}"
+
+      let candidates := match res.tactics with
+        | some ts => if ts.isEmpty then [res.tactic] else ts
+        | none => [res.tactic]
 
       if res.message == "Returned from Cache" then
         logInfo s!"{logPrefix} ⚡ Using cached suggestion."
-      else
-        logInfo s!"{logPrefix} Trying:\n{tacticCode}"
-
-      match parseToWrappedTactic (← getEnv) tacticCode with
-      | Except.error e =>
-        logWarning s!"{logPrefix}{e} Syntax error. Retrying..."
-        let newReq := { req with prevTactic := some tacticCode, errorMsg := some s!"Syntax Error: {e}" }
-        generateLlmTactic (fuel - 1) wType .Fix newReq refStx
-
-      | Except.ok wrappedTStx =>
-        let checkRes ← (try
-            runStrictCheck (unwrapTactic wrappedTStx)
-            pure (Except.ok ())
-          catch e =>
-            pure (Except.error e))
-
-        match checkRes with
-        | Except.ok _ =>
+      else if candidates.length > 1 then
+        logInfo s!"{logPrefix} Received {candidates.length} candidates."
+
+      let mut firstFailure : Option CandidateResult := none
+      for tacticCode in candidates do
+        if res.message != "Returned from Cache" then
+          logInfo s!"{logPrefix} Trying:\n{tacticCode}"
+
+        -- The service flags suggestions that already failed on this goal; skip re-checking them.
+        let result ← match res.knownError with
+          | some msg =>
+            logInfo s!"{logPrefix} Suggestion already failed on this goal, skipping the check."
+            pure (CandidateResult.logicError tacticCode msg)
+          | none => checkCandidate tacticCode
+
+        -- Record new failures so later requests on this goal do not suggest them again.
+        let failed? : Option (String × String) := match result with
+          | .syntaxError code e => some (code, s!"Syntax Error: {e}")
+          | .logicError code msg => some (code, msg)
+          | .ok _ _ => none
+        if let (some (code, err), none) := (failed?, res.knownError) then
+          let failureReq := { req with requestType := "report_failure", prevTactic := some code, errorMsg := some err }
+          discard <| runIO (callLlmService failureReq)
+
+        match result with
+        | .ok code wrappedTStx =>
           let successReq := { req with
             requestType := "report_success",
-            prevTactic := some tacticCode,
+            prevTactic := some code,
             diagnosisInfo := some (toString wType)
           }
           let _ ← runIO (callLlmService successReq)
 
-          return some (tacticCode, wrappedTStx)
+          return some (code, wrappedTStx)
 
-        | Except.error e =>
-          let msg ← e.toMessageData.toString
+        | failure@(.syntaxError _ e) =>
+          logWarning s!"{logPrefix}{e} Syntax error. Retrying..."
+          if firstFailure.isNone then firstFailure := some failure
+
+        | failure@(.logicError _ msg) =>
           logWarning s!"{logPrefix} Logic Check Failed: {msg}"
-          let diagReq := { req with
-            prevTactic := some tacticCode,
-            errorMsg := some msg
-          }
-          generateLlmTactic (fuel - 1) wType .Diagnose diagReq refStx
+          if firstFailure.isNone then firstFailure := some failure
+
+      match firstFailure with
+      | some (.syntaxError tacticCode e) =>
+        let newReq := { req with prevTactic := some tacticCode, errorMsg := some s!"Syntax Error: {e}" }
+        generateLlmTactic (fuel - 1) wType .Fix newReq refStx
+
+      | some (.logicError tacticCode msg) =>
+        let diagReq := { req with
+          prevTactic := some tacticCode,
+          errorMsg := some msg
+        }
+        -- With the service-side index, diagnose, search and fix run as one request.
+        let nextPhase : WorkPhase := if (← runIO getSearchProviderFromEnv) == .serviceIndex then .Repair else .Diagnose
+        generateLlmTactic (fuel - 1) wType nextPhase diagReq refStx
+
+      | _ => return none
 
 unsafe def runInteractiveLlm (stx : Syntax) (wType : WorkType) (num? : Option (TSyntax `num)) (str? : Option (TSyntax `str)) : TacticM Unit := do
   runIO (IO.sleep 500)